@@ -0,0 +1,131 @@
+"""
+Evaluators: ways of scoring unfinished games, for searches that stop
+before the game is over.
+
+A score from an Evaluator is a guess on the same scale as the score of a
+finished game: positive when the searching player is ahead, negative when
+they are behind.
+"""
+
+
+class Evaluator:
+    """
+    An abstract superclass for all Evaluators.
+    """
+
+    def evaluate(self, battle_queue: 'BattleQueue', first_player: str) -> int:
+        """
+        Return a guess at the score of the unfinished game in battle_queue
+        for the player named first_player.
+        """
+        raise NotImplementedError
+
+
+class HPEvaluator(Evaluator):
+    """
+    An Evaluator that only looks at how far ahead in HP a player is.
+    """
+
+    def evaluate(self, battle_queue: 'BattleQueue', first_player: str) -> int:
+        """
+        Return how far ahead of the other player the player named
+        first_player is in HP.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> bq.add(r)
+        >>> bq.add(m)
+        >>> m.set_hp(70)
+        >>> HPEvaluator().evaluate(bq, "r")
+        30
+        >>> HPEvaluator().evaluate(bq, "m")
+        -30
+        """
+        me, other = _split_players(battle_queue, first_player)
+
+        if me is None:
+            return 0
+
+        return me.get_hp() - other.get_hp()
+
+
+class ResourceEvaluator(Evaluator):
+    """
+    An Evaluator that weighs the HP lead of a player together with their SP
+    lead and whether they act next.
+
+    sp_weight - how many HP one point of SP lead is worth.
+    tempo - how many HP acting next is worth.
+    """
+    sp_weight: float
+    tempo: int
+
+    def __init__(self, sp_weight: float = 0.5, tempo: int = 5) -> None:
+        """
+        Initialize this ResourceEvaluator so that one point of SP is worth
+        sp_weight HP and acting next is worth tempo HP.
+        """
+        self.sp_weight = sp_weight
+        self.tempo = tempo
+
+    def evaluate(self, battle_queue: 'BattleQueue', first_player: str) -> int:
+        """
+        Return the HP lead of the player named first_player, plus their SP
+        lead times sp_weight, plus tempo if they act next (minus tempo if
+        the other player does).
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> bq.add(r)
+        >>> bq.add(m)
+        >>> m.set_hp(70)
+        >>> r.set_sp(60)
+        >>> ResourceEvaluator().evaluate(bq, "r")
+        15
+        >>> ResourceEvaluator().evaluate(bq, "m")
+        -15
+        """
+        me, other = _split_players(battle_queue, first_player)
+
+        if me is None:
+            return 0
+
+        score = me.get_hp() - other.get_hp() + \
+            self.sp_weight * (me.get_sp() - other.get_sp())
+
+        if battle_queue.peek() is me:
+            score += self.tempo
+        else:
+            score -= self.tempo
+
+        return round(score)
+
+
+DEFAULT_EVALUATOR = ResourceEvaluator()
+
+
+def _split_players(battle_queue: 'BattleQueue', first_player: str) -> tuple:
+    """
+    Return the player named first_player in battle_queue and the other
+    player, or (None, None) if neither is named first_player.
+    """
+    p1, p2 = battle_queue.get_players()
+
+    if p1.get_name() == first_player:
+        return p1, p2
+    elif p2.get_name() == first_player:
+        return p2, p1
+
+    return None, None
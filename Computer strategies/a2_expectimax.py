@@ -0,0 +1,187 @@
+"""
+Expectimax: a search for playing against an opponent who picks its moves
+at random, like a RandomPlaystyle.
+
+The player searching picks its best move, but the opponent's moves are
+chance nodes: each available move is equally likely, so a state where the
+opponent moves is worth the average of its children. Scores are the same
+winner-HP scores as producer() in a2_playstyle, so every state is worth
+between -1 * the most HP the opponent can have and the most HP the player
+can have. Those bounds let a chance node stop as soon as the moves left
+can't bring its average back inside the window being searched (Star1
+pruning), the same way alpha-beta pruning cuts off a max node.
+"""
+from typing import List
+from a2_search import TranspositionTable, table_key, terminal_score, \
+    score_upper_bound, make_move, unmake_move
+
+
+def score_bounds(battle_queue: 'BattleQueue', first_player: str) -> tuple:
+    """
+    Return the lowest and the highest score the player named first_player
+    can end the game in battle_queue with.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Vampire
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> v = Vampire("v", bq, ManualPlaystyle(bq))
+    >>> r.enemy = v
+    >>> v.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(v)
+    >>> r.set_hp(40)
+    >>> score_bounds(bq, "r")
+    (-140, 40)
+    """
+    p1, p2 = battle_queue.get_players()
+    other = p2 if p1.get_name() == first_player else p1
+
+    return (-1 * score_upper_bound(battle_queue, other.get_name()),
+            score_upper_bound(battle_queue, first_player))
+
+
+def expectimax(battle_queue: 'BattleQueue', first_player: str,
+               alpha: float = float('-inf'), beta: float = float('inf'),
+               table: TranspositionTable = None) -> float:
+    """
+    Return the expected score of battle_queue for the player named
+    first_player, who picks the best moves, against an opponent who picks
+    each available move with the same chance, if it lies strictly between
+    alpha and beta. Otherwise the returned score is a bound, like the score
+    of alpha_beta() in a2_playstyle: a score <= alpha means the real one is
+    at most the returned score, a score >= beta that it is at least that.
+
+    Moves are played on battle_queue itself and taken back afterwards.
+    The bounds found on the expected scores of states are looked up in and
+    stored in table, if given.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> m = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = m
+    >>> m.enemy = r
+    >>> r.set_hp(10)
+    >>> r.set_sp(10)
+    >>> m.set_hp(8)
+    >>> m.set_sp(30)
+    >>> bq.add(m)
+    >>> bq.add(r)
+    >>> expectimax(bq, "r")
+    -8.0
+    >>> expectimax(bq, "r", 0, 10) <= 0
+    True
+    """
+    if battle_queue.is_over():
+        return terminal_score(battle_queue, first_player)
+
+    # Every child's score lies between min_score and max_score, this
+    # state's between lower and upper.
+    min_score, max_score = score_bounds(battle_queue, first_player)
+    lower, upper = min_score, max_score
+
+    if table is not None:
+        key = (table_key(battle_queue, first_player), 'expectimax')
+        entry = table.get(key)
+
+        if entry is not None:
+            lower, upper = entry
+
+    if lower >= beta or lower == upper:
+        return lower
+    if upper <= alpha:
+        return upper
+
+    character = battle_queue.peek()
+    actions = character.get_available_actions()
+
+    if character.get_name() == first_player:
+        score = max(expectimax_scores(battle_queue, first_player, alpha, beta,
+                                      table))
+    else:
+        score = None
+        total = 0
+        n = len(actions)
+
+        for i, action in enumerate(actions):
+            left = n - i - 1
+            undo = make_move(battle_queue, action)
+            # The child is searched in the window that would keep the
+            # average strictly between alpha and beta.
+            total += expectimax(battle_queue, first_player,
+                                n * alpha - total - left * max_score,
+                                n * beta - total - left * min_score, table)
+            unmake_move(battle_queue, undo)
+
+            if (total + left * max_score) / n <= alpha:
+                score = (total + left * max_score) / n
+                break
+            if (total + left * min_score) / n >= beta:
+                score = (total + left * min_score) / n
+                break
+
+        if score is None:
+            score = total / n
+
+    if table is not None:
+        if score >= beta:
+            lower = score
+        elif score <= alpha:
+            upper = score
+        else:
+            lower = upper = score
+
+        table.put(key, (lower, upper))
+
+    return score
+
+
+def expectimax_scores(battle_queue: 'BattleQueue', first_player: str,
+                      alpha: float = float('-inf'),
+                      beta: float = float('inf'),
+                      table: TranspositionTable = None) -> List[float]:
+    """
+    Return the expectimax() score of each move for first_player, the next
+    player in battle_queue, in the order of get_available_actions().
+
+    Like alpha_beta_scores() in a2_playstyle, every move but the best one
+    may get a bound instead of its real score, and the list stops early
+    once a score reaches beta.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> m = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = m
+    >>> m.enemy = r
+    >>> r.set_hp(10)
+    >>> r.set_sp(10)
+    >>> m.set_hp(8)
+    >>> m.set_sp(30)
+    >>> bq.add(r)
+    >>> bq.add(m)
+    >>> expectimax_scores(bq, "r")
+    [-1.0, 10]
+    """
+    scores = []
+    best = float('-inf')
+
+    for action in battle_queue.peek().get_available_actions():
+        undo = make_move(battle_queue, action)
+        score = expectimax(battle_queue, first_player, max(alpha, best), beta,
+                           table)
+        unmake_move(battle_queue, undo)
+
+        scores.append(score)
+        best = max(best, score)
+
+        if best >= beta:
+            break
+
+    return scores
@@ -0,0 +1,267 @@
+"""
+Anytime minimax: the game tree is searched one move deeper at a time, and
+the moves found by the deepest search that finished within the budget are
+used.
+"""
+from typing import Any, Dict, Hashable, List, Tuple
+import threading
+import time
+from a2_search import TranspositionTable, table_key, terminal_score, \
+    make_move, unmake_move
+from a2_evaluation import Evaluator, DEFAULT_EVALUATOR
+
+
+class OutOfBudget(Exception):
+    """
+    Raised when a search runs out of time or nodes.
+    """
+
+
+class SearchBudget:
+    """
+    A limit on how long a search may run.
+
+    deadline - the time.monotonic() at which the search must stop, or None.
+    nodes_left - how many more states the search may expand, or None.
+    stop - an Event that stops the search once it is set, or None.
+    """
+    deadline: float
+    nodes_left: int
+    stop: threading.Event
+
+    def __init__(self, time_budget: float = None,
+                 node_budget: int = None,
+                 stop: threading.Event = None) -> None:
+        """
+        Initialize this SearchBudget to allow time_budget seconds and
+        node_budget expanded states from now, until stop is set. None means
+        no limit.
+        """
+        self.deadline = None if time_budget is None \
+            else time.monotonic() + time_budget
+        self.nodes_left = node_budget
+        self.stop = stop
+
+    def spend(self) -> None:
+        """
+        Record that a state is being expanded. Raise OutOfBudget if this
+        SearchBudget has run out.
+
+        >>> b = SearchBudget(node_budget=1)
+        >>> b.spend()
+        >>> b.spend()
+        Traceback (most recent call last):
+        ...
+        a2_iterative_deepening.OutOfBudget
+        >>> stop = threading.Event()
+        >>> b = SearchBudget(stop=stop)
+        >>> b.spend()
+        >>> stop.set()
+        >>> b.spend()
+        Traceback (most recent call last):
+        ...
+        a2_iterative_deepening.OutOfBudget
+        """
+        if self.stop is not None and self.stop.is_set():
+            raise OutOfBudget
+
+        if self.nodes_left is not None:
+            if self.nodes_left <= 0:
+                raise OutOfBudget
+            self.nodes_left -= 1
+
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise OutOfBudget
+
+
+class BudgetedTable:
+    """
+    A TranspositionTable that spends from a SearchBudget on every lookup,
+    so that any engine that looks its states up in it raises OutOfBudget
+    at its next lookup once the budget has run out. Everything it stores
+    is the score of a state that was fully searched, so the table is still
+    right after the search is stopped.
+
+    table - the TranspositionTable looked up in and stored in.
+    budget - the SearchBudget spent on each lookup.
+    """
+    table: TranspositionTable
+    budget: SearchBudget
+
+    def __init__(self, table: TranspositionTable,
+                 budget: SearchBudget) -> None:
+        """
+        Initialize this BudgetedTable, which looks up in table and spends
+        from budget.
+        """
+        self.table = table
+        self.budget = budget
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the value stored for key in table, or None if there isn't
+        one, after spending from budget.
+
+        >>> t = BudgetedTable(TranspositionTable(), SearchBudget(node_budget=1))
+        >>> t.put('a', 5)
+        >>> t.get('a')
+        5
+        >>> t.get('a')
+        Traceback (most recent call last):
+        ...
+        a2_iterative_deepening.OutOfBudget
+        """
+        self.budget.spend()
+        return self.table.get(key)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store value for key in table.
+        """
+        self.table.put(key, value)
+
+    def __len__(self) -> int:
+        """
+        Return the number of entries in table.
+        """
+        return len(self.table)
+
+
+def deepening_scores(battle_queue: 'BattleQueue', first_player: str,
+                     table: TranspositionTable = None,
+                     time_budget: float = None, node_budget: int = None,
+                     depth_limit: int = None,
+                     evaluator: Evaluator = None,
+                     stop: threading.Event = None) -> List[int]:
+    """
+    Return the scores of each move for first_player, searching one move
+    deeper at a time until the whole game tree is searched, depth_limit
+    moves have been searched, or time_budget seconds or node_budget
+    expanded states have been used up.
+
+    Unfinished games at the search depth are scored with evaluator, or
+    DEFAULT_EVALUATOR if it is None. Once the whole tree is searched, the
+    scores are the same as producer(battle_queue, first_player) in
+    a2_playstyle. The first depth is always searched completely, whatever
+    the budget; without a budget, depth_limit is searched straight away.
+
+    Scores of states whose whole subtree was searched are looked up in and
+    stored in table, if given. battle_queue is left as it was.
+
+    If stop is given, OutOfBudget is raised soon after it is set, at any
+    depth, instead of returning the scores of a shallower search.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(20)
+    >>> mage.set_hp(27)
+    >>> mage.set_sp(40)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> deepening_scores(bq, "m")
+    [20, 27]
+    >>> deepening_scores(bq, "m", node_budget=0)
+    [10, 27]
+    >>> from a2_evaluation import HPEvaluator
+    >>> deepening_scores(bq, "m", depth_limit=2, evaluator=HPEvaluator())
+    [0, 27]
+    """
+    if evaluator is None:
+        evaluator = DEFAULT_EVALUATOR
+
+    depth = 1
+    if depth_limit is not None and time_budget is None and \
+            node_budget is None:
+        depth = max(depth_limit, 1)
+
+    budget = SearchBudget(time_budget, node_budget, stop)
+    scores, exact = _limited_scores(battle_queue, first_player, depth, table,
+                                    evaluator, SearchBudget(stop=stop), {})
+
+    while not exact and (depth_limit is None or depth < depth_limit):
+        depth += 1
+
+        try:
+            scores, exact = _limited_scores(battle_queue, first_player, depth,
+                                            table, evaluator, budget, {})
+        except OutOfBudget:
+            if stop is not None and stop.is_set():
+                raise
+            break
+
+    return scores
+
+
+def _limited_scores(battle_queue: 'BattleQueue', first_player: str,
+                    depth: int, table: TranspositionTable,
+                    evaluator: Evaluator, budget: SearchBudget,
+                    cache: Dict[tuple, int]) -> Tuple[List[int], bool]:
+    """
+    Return the scores of each move for first_player when searching depth
+    moves ahead, and whether all of them are exact.
+
+    cache holds the scores of the states whose subtree was cut off at the
+    search depth, by state and remaining depth.
+    """
+    scores = []
+    exact = True
+
+    for action in battle_queue.peek().get_available_actions():
+        undo = make_move(battle_queue, action)
+
+        try:
+            score, child_exact = _limited_score(battle_queue, first_player,
+                                                depth - 1, table, evaluator,
+                                                budget, cache)
+        finally:
+            unmake_move(battle_queue, undo)
+
+        scores.append(score)
+        exact = exact and child_exact
+
+    return scores, exact
+
+
+def _limited_score(battle_queue: 'BattleQueue', first_player: str,
+                   depth: int, table: TranspositionTable,
+                   evaluator: Evaluator, budget: SearchBudget,
+                   cache: Dict[tuple, int]) -> Tuple[int, bool]:
+    """
+    Return the score of battle_queue for first_player when searching depth
+    moves ahead, and whether it is exact.
+    """
+    if battle_queue.is_over():
+        return terminal_score(battle_queue, first_player), True
+
+    key = table_key(battle_queue, first_player)
+
+    if table is not None:
+        score = table.get(key)
+
+        if score is not None:
+            return score, True
+
+    if depth <= 0:
+        return evaluator.evaluate(battle_queue, first_player), False
+
+    if (key, depth) in cache:
+        return cache[(key, depth)], False
+
+    budget.spend()
+    scores, exact = _limited_scores(battle_queue, first_player, depth, table,
+                                    evaluator, budget, cache)
+    score = max(scores)
+
+    if not exact:
+        cache[(key, depth)] = score
+    elif table is not None:
+        table.put(key, score)
+
+    return score, exact
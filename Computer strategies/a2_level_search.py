@@ -0,0 +1,131 @@
+"""
+A level-by-level minimax: the game tree is expanded one move deeper at a
+time, with the identical states of each level merged so the tree becomes a
+DAG, and the scores are then backed up a whole level at a time from the
+deepest level.
+
+HP and SP only run out over a game, so many move orders lead to the same
+states and each level of the DAG is much smaller than that level of the
+tree.
+"""
+from typing import Dict, List, Tuple
+from a2_battle_state import BattleState, to_battle_state, player_index
+from a2_search import TranspositionTable
+
+
+def expand_levels(root: BattleState, player: int,
+                  table: TranspositionTable = None) \
+        -> Tuple[List[List[BattleState]], List[List[tuple]],
+                 List[Dict[int, int]]]:
+    """
+    Return the levels of the DAG below root: the distinct states of each
+    level, the indices in the next level of each state's children, and the
+    scores already known for player of the states in each level, by index.
+    The last level is always empty.
+
+    A state is a leaf if its game is over or its score is in table.
+
+    >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3), (0, 1))
+    >>> levels, children, known = expand_levels(s, 0)
+    >>> [len(level) for level in levels]
+    [1, 2, 1, 0]
+    >>> children[0]
+    [(0, 1)]
+    >>> known[1]
+    {1: 7}
+    """
+    levels = [[root]]
+    children = []
+    known = [{}]
+
+    while levels[-1]:
+        next_level = []
+        next_index = {}
+        next_known = {}
+        level_children = []
+
+        for i, state in enumerate(levels[-1]):
+            if i in known[-1]:
+                level_children.append(())
+                continue
+
+            indices = []
+
+            for action in state.get_available_actions():
+                child = state.apply(action)
+                index = next_index.get(child)
+
+                if index is None:
+                    index = len(next_level)
+                    next_index[child] = index
+                    next_level.append(child)
+
+                    if child.is_over():
+                        next_known[index] = child.get_score(player)
+                    elif table is not None:
+                        score = table.get((child, player))
+
+                        if score is not None:
+                            next_known[index] = score
+
+                indices.append(index)
+
+            level_children.append(tuple(indices))
+
+        children.append(level_children)
+        levels.append(next_level)
+        known.append(next_known)
+
+    return levels, children, known
+
+
+def level_scores(battle_queue: 'BattleQueue', first_player: str,
+                 table: TranspositionTable = None) -> List[int]:
+    """
+    Return the same scores as producer(battle_queue, first_player) in
+    a2_playstyle, expanding the game level by level and backing the scores
+    up from the deepest level.
+
+    Scores of states are looked up in and stored in table, if given. Like
+    BattleState, this assumes Sorcerers use the default SkillDecisionTree.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(20)
+    >>> mage.set_hp(27)
+    >>> mage.set_sp(40)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> level_scores(bq, "m")
+    [20, 27]
+    """
+    player = player_index(battle_queue, first_player)
+    levels, children, known = expand_levels(to_battle_state(battle_queue),
+                                            player, table)
+
+    # The last level is empty, so the level above it only has leaves.
+    scores = []
+
+    for depth in range(len(levels) - 2, 0, -1):
+        child_scores = scores
+        scores = []
+
+        for i, indices in enumerate(children[depth]):
+            if indices:
+                score = max(child_scores[j] for j in indices)
+
+                if table is not None:
+                    table.put((levels[depth][i], player), score)
+            else:
+                score = known[depth][i]
+
+            scores.append(score)
+
+    return [scores[j] for j in children[0][0]]
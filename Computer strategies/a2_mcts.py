@@ -0,0 +1,272 @@
+"""
+Monte Carlo tree search (UCT) over BattleStates.
+
+Instead of solving the whole game tree, a search grows a tree one state per
+playout: it walks down the tree picking the move with the best UCB1 value,
+adds one new state, finishes the game from there with random moves (the
+same way a RandomPlaystyle would) and adds the result to every state on the
+way back up. More playouts give better moves, so the number of playouts or
+the time spent on them trades quality for speed.
+
+Each state's moves are scored for the player making them, so both players
+are assumed to play for themselves.
+"""
+from typing import Dict, List, Union
+import math
+import random
+import time
+from a2_battle_state import BattleState, to_battle_state
+
+DEFAULT_PLAYOUTS = 1000
+DEFAULT_EXPLORATION = math.sqrt(2)
+
+
+class MCTSNode:
+    """
+    A state in a Monte Carlo search tree.
+
+    state - the BattleState of this node.
+    parent - the MCTSNode this node's state was reached from, or None.
+    children - the child MCTSNode reached by each action tried so far.
+    untried - the available actions that have no child yet.
+    visits - the number of playouts that went through this node.
+    total - the sum of the rewards of those playouts for the player who
+            moved into this node.
+    """
+    state: BattleState
+    parent: Union['MCTSNode', None]
+    children: Dict[str, 'MCTSNode']
+    untried: List[str]
+    visits: int
+    total: float
+
+    def __init__(self, state: BattleState,
+                 parent: 'MCTSNode' = None) -> None:
+        """
+        Initialize this MCTSNode for state, reached from parent.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (100, 100), (20, 5),
+        ...                 (0, 1))
+        >>> MCTSNode(s).untried
+        ['A']
+        """
+        self.state = state
+        self.parent = parent
+        self.children = {}
+        self.untried = [] if state.is_over() \
+            else state.get_available_actions()
+        self.visits = 0
+        self.total = 0.0
+
+    def best_child(self, exploration: float) -> 'MCTSNode':
+        """
+        Return the child of this MCTSNode with the highest UCB1 value.
+        """
+        log_visits = math.log(self.visits)
+        best = None
+        best_value = float('-inf')
+
+        for child in self.children.values():
+            value = child.total / child.visits + \
+                exploration * math.sqrt(log_visits / child.visits)
+
+            if value > best_value:
+                best = child
+                best_value = value
+
+        return best
+
+    def find(self, state: BattleState, depth: int) -> Union['MCTSNode', None]:
+        """
+        Return the node for state among this MCTSNode and its descendants at
+        most depth moves below it, or None if there isn't one.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (100, 100), (20, 5),
+        ...                 (0, 1))
+        >>> root = MCTSNode(s)
+        >>> child = MCTSNode(s.apply('A'), root)
+        >>> root.children['A'] = child
+        >>> root.find(s.apply('A'), 1) is child
+        True
+        >>> root.find(s.apply('A').apply('A'), 2) is None
+        True
+        """
+        if self.state == state:
+            return self
+
+        if depth > 0:
+            for child in self.children.values():
+                found = child.find(state, depth - 1)
+
+                if found is not None:
+                    return found
+
+        return None
+
+
+def playout(state: BattleState, rng: random.Random) -> BattleState:
+    """
+    Return the finished game reached from state when both players make
+    random moves.
+
+    >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3), (0, 1))
+    >>> playout(s, random.Random(0)).is_over()
+    True
+    """
+    while not state.is_over():
+        state = state.apply(rng.choice(state.get_available_actions()))
+
+    return state
+
+
+def reward(state: BattleState, player: int, scale: int) -> float:
+    """
+    Return the score of the finished game in state for player, divided by
+    scale so that it is between -1 and 1.
+
+    >>> s = BattleState(False, ('mage', 'rogue'), (40, 0), (20, 5), (0, 1))
+    >>> reward(s, 1, 200)
+    -0.2
+    """
+    return state.get_score(player) / scale
+
+
+class MCTSSearch:
+    """
+    A Monte Carlo search tree that can be searched again from a later state
+    of the same game, keeping what it learned about that state.
+
+    root - the MCTSNode of the state last searched from, or None.
+    exploration - how much UCB1 favours moves that were tried less often.
+    reuse_depth - how many moves below the last searched state the next
+                  state is looked for before starting a new tree.
+    """
+    root: Union[MCTSNode, None]
+    exploration: float
+    reuse_depth: int
+
+    def __init__(self, exploration: float = DEFAULT_EXPLORATION,
+                 seed: int = None, reuse_depth: int = 4) -> None:
+        """
+        Initialize this MCTSSearch, making random moves seeded with seed.
+        """
+        self.root = None
+        self.exploration = exploration
+        self.reuse_depth = reuse_depth
+        self._rng = random.Random(seed)
+
+    def move_to(self, state: BattleState) -> MCTSNode:
+        """
+        Make the node for state the root of this MCTSSearch, reusing it and
+        its subtree if the tree already has it.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                 (0, 1))
+        >>> search = MCTSSearch(seed=0)
+        >>> _ = search.search(s, playouts=50)
+        >>> child = search.root.children['S']
+        >>> search.move_to(s.apply('S')) is child
+        True
+        >>> child.parent is None
+        True
+        """
+        node = self.root.find(state, self.reuse_depth) \
+            if self.root is not None else None
+
+        if node is None:
+            node = MCTSNode(state)
+
+        node.parent = None
+        self.root = node
+        return node
+
+    def search(self, state: BattleState, playouts: int = DEFAULT_PLAYOUTS,
+               time_budget: float = None) -> Dict[str, int]:
+        """
+        Run playouts from state, stopping after playouts playouts or, if
+        time_budget is given, after time_budget seconds and at least one
+        playout. Return how many times the root of the tree has tried each
+        of its moves.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                 (0, 1))
+        >>> visits = MCTSSearch(seed=0).search(s, playouts=200)
+        >>> sum(visits.values())
+        200
+        >>> max(visits, key=visits.get)
+        'S'
+        >>> sum(MCTSSearch(seed=0).search(s, time_budget=0.0).values())
+        1
+        """
+        root = self.move_to(state)
+        scale = max(sum(state.hp), 1)
+        deadline = time.monotonic() + time_budget if time_budget is not None \
+            else None
+        done = 0
+
+        while (done < playouts if deadline is None
+               else done == 0 or time.monotonic() < deadline):
+            node = root
+
+            while not node.untried and node.children:
+                node = node.best_child(self.exploration)
+
+            if node.untried:
+                action = node.untried.pop()
+                child = MCTSNode(node.state.apply(action), node)
+                node.children[action] = child
+                node = child
+
+            end = playout(node.state, self._rng)
+
+            while node is not None:
+                node.visits += 1
+
+                if node.parent is not None:
+                    node.total += reward(end, node.parent.state.peek(),
+                                         scale)
+                node = node.parent
+
+            done += 1
+
+        return {action: child.visits
+                for action, child in root.children.items()}
+
+    def best_action(self, state: BattleState,
+                    playouts: int = DEFAULT_PLAYOUTS,
+                    time_budget: float = None) -> str:
+        """
+        Search from state and return the move the root tried most often, or
+        'X' if the next player in state cannot move. If no move was tried,
+        the first available one is returned.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                 (0, 1))
+        >>> MCTSSearch(seed=0).best_action(s, playouts=200)
+        'S'
+        >>> s = BattleState(False, ('mage', 'rogue'), (100, 100), (100, 100),
+        ...                 (0, 1))
+        >>> MCTSSearch(seed=0).best_action(s, playouts=0)
+        'A'
+        """
+        actions = state.get_available_actions()
+
+        if state.is_over() or not actions:
+            return 'X'
+
+        visits = self.search(state, playouts, time_budget)
+
+        return max(actions, key=lambda action: visits.get(action, 0))
+
+
+def mcts_action(battle_queue: 'BattleQueue', search: MCTSSearch,
+                playouts: int = DEFAULT_PLAYOUTS,
+                time_budget: float = None) -> str:
+    """
+    Return the move search picks for the next player in battle_queue.
+    """
+    if not battle_queue.peek().get_available_actions():
+        return 'X'
+
+    return search.best_action(to_battle_state(battle_queue), playouts,
+                              time_budget)
@@ -0,0 +1,255 @@
+"""
+An iterative minimax whose game tree is stored in flat arrays.
+
+itarate_the_recursion() in a2_playstyle builds a list and a BattleQueue for
+every node. Here, a node is an index into the parallel columns of a
+NodeStore, and the BattleStates of the nodes are kept once each in a
+StatePool, so millions of nodes only take a few arrays of ints. The nodes
+of a subtree are dropped from the NodeStore as soon as it is solved, so it
+only holds the nodes on the path being searched and their siblings.
+"""
+from typing import List
+from array import array
+from a2_battle_state import BattleState, to_battle_state, player_index
+from a2_search import TranspositionTable
+
+ACTIONS = ['A', 'S']
+NO_ACTION = -1
+NO_PARENT = -1
+# The score of a node that hasn't been solved yet. Lower than every score.
+UNSOLVED = -(2 ** 31)
+
+
+class StatePool:
+    """
+    The BattleStates of a search, each stored once and known by its id.
+
+    states - the BattleState with each id.
+    scores - the score of the BattleState with each id, or UNSOLVED.
+    """
+    states: List[BattleState]
+    scores: array
+
+    def __init__(self) -> None:
+        """
+        Initialize this StatePool with no states.
+        """
+        self.states = []
+        self.scores = array('i')
+        self._ids = {}
+
+    def add(self, state: BattleState) -> int:
+        """
+        Return the id of state, adding it to this StatePool if it isn't in
+        it already.
+
+        >>> pool = StatePool()
+        >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                 (0, 1))
+        >>> pool.add(s)
+        0
+        >>> pool.add(s.apply('A'))
+        1
+        >>> pool.add(BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                      (0, 1)))
+        0
+        >>> len(pool)
+        2
+        """
+        state_id = self._ids.get(state)
+
+        if state_id is None:
+            state_id = len(self.states)
+            self._ids[state] = state_id
+            self.states.append(state)
+            self.scores.append(UNSOLVED)
+
+        return state_id
+
+    def __len__(self) -> int:
+        """
+        Return the number of states in this StatePool.
+        """
+        return len(self.states)
+
+
+class NodeStore:
+    """
+    The nodes of a game tree, stored as parallel columns indexed by node.
+
+    parent - the index of each node's parent, or NO_PARENT for the root.
+    action - the index in ACTIONS of the move that led to each node, or
+             NO_ACTION for the root.
+    state - the id of each node's BattleState in a StatePool.
+    score - each node's score, or the best score of its children so far
+            while it isn't solved.
+    pending - how many of each node's children aren't solved yet.
+    """
+    parent: array
+    action: array
+    state: array
+    score: array
+    pending: array
+
+    def __init__(self) -> None:
+        """
+        Initialize this NodeStore with no nodes.
+        """
+        self.parent = array('i')
+        self.action = array('b')
+        self.state = array('i')
+        self.score = array('i')
+        self.pending = array('b')
+
+    def add(self, parent: int, action: int, state: int) -> int:
+        """
+        Add a node for the state with id state, reached from parent with
+        action, and return its index.
+
+        >>> store = NodeStore()
+        >>> store.add(NO_PARENT, NO_ACTION, 0)
+        0
+        >>> store.add(0, ACTIONS.index('S'), 1)
+        1
+        >>> store.parent[1], ACTIONS[store.action[1]], store.state[1]
+        (0, 'S', 1)
+        """
+        self.parent.append(parent)
+        self.action.append(action)
+        self.state.append(state)
+        self.score.append(UNSOLVED)
+        self.pending.append(0)
+
+        return len(self.parent) - 1
+
+    def truncate(self, size: int) -> None:
+        """
+        Drop every node from index size on.
+
+        >>> store = NodeStore()
+        >>> store.add(NO_PARENT, NO_ACTION, 0)
+        0
+        >>> store.add(0, ACTIONS.index('S'), 1)
+        1
+        >>> store.truncate(1)
+        >>> len(store)
+        1
+        """
+        for column in (self.parent, self.action, self.state, self.score,
+                       self.pending):
+            del column[size:]
+
+    def __len__(self) -> int:
+        """
+        Return the number of nodes in this NodeStore.
+        """
+        return len(self.parent)
+
+
+def array_scores(battle_queue: 'BattleQueue', first_player: str,
+                 table: TranspositionTable = None) -> List[int]:
+    """
+    Return the same scores as producer(battle_queue, first_player) in
+    a2_playstyle, searching iteratively with a NodeStore and a StatePool.
+
+    A state that was already solved in this search isn't searched again.
+    Scores of solved states are also looked up in and stored in table, if
+    given. Like BattleState, this assumes Sorcerers use the default
+    SkillDecisionTree. If the game in battle_queue is already over, its
+    score is the only one, as with producer().
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(20)
+    >>> mage.set_hp(27)
+    >>> mage.set_sp(40)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> array_scores(bq, "m")
+    [20, 27]
+    >>> r.set_hp(0)
+    >>> array_scores(bq, "m")
+    [27]
+    """
+    player = player_index(battle_queue, first_player)
+    root_state = to_battle_state(battle_queue)
+
+    if root_state.is_over():
+        return [root_state.get_score(player)]
+
+    pool = StatePool()
+    store = NodeStore()
+    root = store.add(NO_PARENT, NO_ACTION, pool.add(root_state))
+    moves = len(root_state.get_available_actions())
+    to_visit = array('i', [root])
+
+    while to_visit:
+        node = to_visit.pop()
+        state_id = store.state[node]
+        state = pool.states[state_id]
+        score = pool.scores[state_id]
+
+        if state.is_over():
+            score = state.get_score(player)
+        elif score == UNSOLVED and table is not None and node != root:
+            found = table.get((state, player))
+            score = UNSOLVED if found is None else found
+
+        if score != UNSOLVED:
+            solved = _resolve(store, pool, node, score, player, table)
+            # Everything after the solved node is solved too, as the nodes
+            # still to visit were all added before it, but the root's
+            # children hold the scores returned.
+            store.truncate(max(solved + 1, root + 1 + moves))
+            continue
+
+        actions = state.get_available_actions()
+        store.pending[node] = len(actions)
+
+        for action in actions:
+            child = store.add(node, ACTIONS.index(action),
+                              pool.add(state.apply(action)))
+            to_visit.append(child)
+
+    # The root's children were the first nodes added after it.
+    return list(store.score[root + 1:root + 1 + moves])
+
+
+def _resolve(store: NodeStore, pool: StatePool, node: int, score: int,
+             player: int, table: TranspositionTable) -> int:
+    """
+    Give node the score score and pass it up to its ancestors, solving each
+    one whose children are now all solved. Return the highest node solved.
+    """
+    while True:
+        store.score[node] = score
+        state_id = store.state[node]
+
+        if pool.scores[state_id] == UNSOLVED:
+            pool.scores[state_id] = score
+
+            if table is not None and not pool.states[state_id].is_over():
+                table.put((pool.states[state_id], player), score)
+
+        parent = store.parent[node]
+
+        if parent == NO_PARENT:
+            return node
+
+        if score > store.score[parent]:
+            store.score[parent] = score
+
+        store.pending[parent] -= 1
+
+        if store.pending[parent] > 0:
+            return node
+
+        node = parent
+        score = store.score[parent]
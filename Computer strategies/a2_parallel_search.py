@@ -0,0 +1,218 @@
+"""
+Root-parallel minimax: the subtrees near the root of the game tree are
+solved in separate processes and their scores are merged afterwards.
+
+A SearchPool keeps its worker processes, and the TranspositionTable each
+of them fills, from one search to the next, so a Playstyle only pays for
+starting them once.
+"""
+from typing import Dict, List
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+import threading
+from a2_battle_state import BattleState, to_battle_state, player_index
+from a2_search import TranspositionTable, state_score
+from a2_iterative_deepening import OutOfBudget
+
+# The TranspositionTable of a worker process, shared by every subtree it
+# solves.
+WORKER_TABLE = None
+# How many seconds a stoppable search waits for its subtrees between
+# checking whether it was stopped.
+STOP_CHECK_INTERVAL = 0.01
+
+
+class SearchPool:
+    """
+    Worker processes for parallel_scores(), started the first time they are
+    needed and kept until shutdown() is called.
+
+    workers - the most worker processes, or None for one per CPU.
+    """
+    workers: int
+
+    def __init__(self, workers: int = None) -> None:
+        """
+        Initialize this SearchPool of up to workers processes, without
+        starting any.
+        """
+        self.workers = workers
+        self._executor = None
+
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        Return the ProcessPoolExecutor of this SearchPool, starting it if it
+        isn't running.
+
+        >>> pool = SearchPool(1)
+        >>> pool.executor() is pool.executor()
+        True
+        >>> pool.shutdown()
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 initializer=_start_worker)
+
+        return self._executor
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the worker processes of this SearchPool, if they are running.
+        They are started again if this SearchPool is used afterwards.
+
+        If not wait, subtrees that haven't been started are dropped and
+        this returns without waiting for the ones being solved.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+
+def parallel_scores(battle_queue: 'BattleQueue', first_player: str,
+                    table: TranspositionTable = None, workers: int = None,
+                    split_depth: int = 1, pool: SearchPool = None,
+                    stop: threading.Event = None) -> List[int]:
+    """
+    Return the same scores as producer(battle_queue, first_player) in
+    a2_playstyle, solving the states split_depth moves below battle_queue
+    in the worker processes of pool. If pool is None, a SearchPool of up to
+    workers processes (one per CPU if workers is None) is started for this
+    search only.
+
+    Scores of split states are looked up in and stored in table, if given.
+
+    If stop is given, the subtrees that haven't been started are dropped
+    and OutOfBudget is raised soon after it is set. The subtrees being
+    solved are finished by their worker processes.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(20)
+    >>> mage.set_hp(27)
+    >>> mage.set_sp(40)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> parallel_scores(bq, "m", workers=2, split_depth=2)
+    [20, 27]
+    >>> pool = SearchPool(2)
+    >>> parallel_scores(bq, "m", split_depth=2, pool=pool)
+    [20, 27]
+    >>> parallel_scores(bq, "r", split_depth=2, pool=pool)
+    [0, -27]
+    >>> pool.shutdown()
+    """
+    root = to_battle_state(battle_queue)
+    player = player_index(battle_queue, first_player)
+
+    children = [root.apply(action)
+                for action in root.get_available_actions()]
+    frontier = set()
+    for child in children:
+        _collect_frontier(child, split_depth - 1, frontier)
+
+    scores = {}
+    unsolved = []
+    for state in frontier:
+        score = table.get((state, player)) if table is not None else None
+
+        if score is None:
+            unsolved.append(state)
+        else:
+            scores[state] = score
+
+    if unsolved:
+        own_pool = pool is None
+
+        if own_pool:
+            pool = SearchPool(workers)
+
+        try:
+            executor = pool.executor()
+            solved = [executor.submit(_solve, state, player)
+                      for state in unsolved]
+
+            if stop is not None:
+                _wait_unless_stopped(solved, stop)
+
+            for state, future in zip(unsolved, solved):
+                score = future.result()
+                scores[state] = score
+
+                if table is not None:
+                    table.put((state, player), score)
+        finally:
+            if own_pool:
+                pool.shutdown()
+
+    return [_merge(child, split_depth - 1, player, scores)
+            for child in children]
+
+
+def _wait_unless_stopped(futures: List[Future],
+                         stop: threading.Event) -> None:
+    """
+    Wait until futures are done, or cancel the ones that haven't started
+    and raise OutOfBudget once stop is set.
+    """
+    pending = set(futures)
+
+    while pending:
+        if stop.is_set():
+            for future in pending:
+                future.cancel()
+            raise OutOfBudget
+
+        pending = wait(pending, timeout=STOP_CHECK_INTERVAL).not_done
+
+
+def _start_worker() -> None:
+    """
+    Set up the TranspositionTable of a new worker process.
+    """
+    global WORKER_TABLE
+
+    WORKER_TABLE = TranspositionTable()
+
+
+def _solve(state: BattleState, player: int) -> int:
+    """
+    Return the score of state for player. Runs in a worker process.
+    """
+    return state_score(state, player, WORKER_TABLE)
+
+
+def _collect_frontier(state: BattleState, depth: int, frontier: set) -> None:
+    """
+    Add to frontier every unfinished state depth moves below state.
+    """
+    if state.is_over():
+        return
+
+    if depth <= 0:
+        frontier.add(state)
+        return
+
+    for action in state.get_available_actions():
+        _collect_frontier(state.apply(action), depth - 1, frontier)
+
+
+def _merge(state: BattleState, depth: int, player: int,
+           scores: Dict[BattleState, int]) -> int:
+    """
+    Return the score of state for player, given the scores of the states
+    depth moves below it.
+    """
+    if state.is_over():
+        return state.get_score(player)
+
+    if depth <= 0:
+        return scores[state]
+
+    return max(_merge(state.apply(action), depth - 1, player, scores)
+               for action in state.get_available_actions())
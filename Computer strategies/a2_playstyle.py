@@ -1,6 +1,22 @@
-from typing import Any, List
+from typing import Any, List, Tuple, Union
 import random
+import threading
 from stack import Stack
+from a2_search import TranspositionTable, DEFAULT_TABLE_SIZE, table_key, \
+    terminal_score, score_upper_bound, make_move, unmake_move
+from a2_parallel_search import parallel_scores, SearchPool
+from a2_iterative_deepening import deepening_scores, SearchBudget, \
+    BudgetedTable, OutOfBudget
+from a2_evaluation import Evaluator, DEFAULT_EVALUATOR
+from a2_node_store import array_scores
+from a2_level_search import level_scores
+from a2_tablebase import Tablebase, tablebase_scores
+from a2_battle_state import uses_default_trees
+from a2_result_cache import ResultCache
+from a2_ponder import Ponderer
+from a2_expectimax import expectimax_scores
+from a2_mcts import MCTSSearch, mcts_action, DEFAULT_PLAYOUTS, \
+    DEFAULT_EXPLORATION
 
 class Playstyle:
     """
@@ -94,11 +110,15 @@ class RandomPlaystyle(Playstyle):
         """
         return RandomPlaystyle(new_battle_queue)
 
-def get_state_score(battle_queue: 'BattleQueue') -> int:
+def get_state_score(battle_queue: 'BattleQueue',
+                    table: TranspositionTable = None) -> int:
     """
     Return an int corresponding to the highest score that the next player in
     battle_queue can guarantee.
 
+    If table is given, scores of states that were already solved are read
+    from it instead of being searched again.
+
     For a state that's over, the score is the HP of the character who still has
     HP if the next player who was supposed to act is the winner. If the next
     player who was supposed to act is the loser, then the score is -1 * the
@@ -125,21 +145,27 @@ def get_state_score(battle_queue: 'BattleQueue') -> int:
     >>> bq.add(r)
     >>> get_state_score(bq)
     -10
+    >>> get_state_score(bq, TranspositionTable())
+    -10
     """
 
     first_player = battle_queue.peek().get_name()
 
     j = battle_queue.copy()
-    return max(producer(j, first_player))
+    return max(producer(j, first_player, table))
 
 
 
 
-def producer(battle_queue, first_player) -> List:
+def producer(battle_queue, first_player,
+             table: TranspositionTable = None) -> List:
 
     """
     returns the scores of each move for first_player
 
+    if table is given, it is used to look up and store the scores of the
+    states below battle_queue
+
     >>> from a2_battle_queue import BattleQueue
     >>> from a2_characters import Rogue, Mage
 
@@ -158,6 +184,8 @@ def producer(battle_queue, first_player) -> List:
     >>> bq.add(r)
     >>> producer(bq, bq.peek().get_name())
     [-20, 7]
+    >>> producer(bq, bq.peek().get_name(), TranspositionTable())
+    [-20, 7]
     """
 
 
@@ -192,10 +220,49 @@ def producer(battle_queue, first_player) -> List:
 
 
     for i in m:
-        accumulator += [max(producer(i, first_player))]
+        accumulator += [subtree_score(i, first_player, table)]
 
     return accumulator
 
+def subtree_score(battle_queue, first_player,
+                  table: TranspositionTable = None) -> int:
+    """
+    returns max(producer(battle_queue, first_player)), looking the score up
+    in table first and storing it there afterwards
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(3)
+    >>> mage.set_hp(7)
+    >>> mage.set_sp(30)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> t = TranspositionTable()
+    >>> subtree_score(bq, "m", t)
+    7
+    >>> subtree_score(bq, "m", t)
+    7
+    >>> t.hits
+    1
+    """
+    if table is None:
+        return max(producer(battle_queue, first_player))
+
+    key = table_key(battle_queue, first_player)
+    score = table.get(key)
+
+    if score is None:
+        score = max(producer(battle_queue, first_player, table))
+        table.put(key, score)
+
+    return score
+
 def mover(action, character) -> None:
     """
     maakes the appropriate move for character based on action
@@ -218,14 +285,235 @@ def mover(action, character) -> None:
     elif action == 'S':
         character.special_attack()
 
+def make_child(battle_queue, action) -> 'BattleQueue':
+    """
+    returns a copy of battle_queue after its next character performs action,
+    the same way producer() builds its children
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(mage)
+    >>> make_child(bq, 'S')
+    m (Mage): 88/100 -> r (Rogue): 100/90 -> r (Rogue): 100/90
+    >>> bq
+    r (Rogue): 100/100 -> m (Mage): 100/100
+    """
+    child = battle_queue.copy()
+    mover(action, child.peek())
 
+    if not child.is_empty():
+        child.remove()
 
+    return child
 
+def in_place_scores(battle_queue, first_player,
+                    table: TranspositionTable = None) -> List:
+    """
+    returns the same scores as producer(battle_queue, first_player), but
+    plays every move on battle_queue itself and takes it back afterwards
+    instead of copying battle_queue for each move
 
-def itarate_the_recursion(battle_queue) -> List:
+    battle_queue is left as it was.
 
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(3)
+    >>> mage.set_hp(7)
+    >>> mage.set_sp(30)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> in_place_scores(bq, bq.peek().get_name())
+    [-20, 7]
+    >>> bq
+    m (Mage): 7/30 -> r (Rogue): 30/3
     """
-    returns a list containing all state scores in every level
+    if battle_queue.is_over():
+        return [terminal_score(battle_queue, first_player)]
+
+    scores = []
+
+    for action in battle_queue.peek().get_available_actions():
+        undo = make_move(battle_queue, action)
+
+        if table is None:
+            score = max(in_place_scores(battle_queue, first_player))
+        else:
+            key = table_key(battle_queue, first_player)
+            score = table.get(key)
+
+            if score is None:
+                score = max(in_place_scores(battle_queue, first_player,
+                                            table))
+                table.put(key, score)
+
+        unmake_move(battle_queue, undo)
+        scores.append(score)
+
+    return scores
+
+def alpha_beta(battle_queue, first_player, alpha=float('-inf'),
+               beta=float('inf'), table: TranspositionTable = None,
+               in_place: bool = False) -> int:
+    """
+    returns max(producer(battle_queue, first_player)) if it lies strictly
+    between alpha and beta, skipping the subtrees that cannot change that
+
+    otherwise the returned score is a bound (fail-soft): a score <= alpha
+    means the real one is at most the returned score, and a score >= beta
+    means the real one is at least the returned score
+
+    if in_place is True, moves are played on battle_queue itself and taken
+    back afterwards, like in_place_scores(), instead of on copies
+
+    >>> from a2_battle_queue import BattleQueue, RestrictedBattleQueue
+    >>> from a2_characters import Rogue, Mage, Vampire, Sorcerer
+    >>> classes = [Rogue, Mage, Vampire, Sorcerer]
+    >>> same = []
+    >>> for queue_class in [BattleQueue, RestrictedBattleQueue]:
+    ...     for c1 in classes:
+    ...         for c2 in classes:
+    ...             bq = queue_class()
+    ...             p1 = c1("p1", bq, ManualPlaystyle(bq))
+    ...             p2 = c2("p2", bq, ManualPlaystyle(bq))
+    ...             p1.enemy = p2
+    ...             p2.enemy = p1
+    ...             p1.set_hp(60)
+    ...             p2.set_hp(45)
+    ...             p1.set_sp(40)
+    ...             p2.set_sp(45)
+    ...             bq.add(p1)
+    ...             bq.add(p2)
+    ...             same += [alpha_beta(bq, "p1") == get_state_score(bq)]
+    >>> all(same)
+    True
+    """
+    if battle_queue.is_over():
+        return terminal_score(battle_queue, first_player)
+
+    lower = float('-inf')
+    upper = score_upper_bound(battle_queue, first_player)
+
+    if table is not None:
+        key = (table_key(battle_queue, first_player), 'bounds')
+        entry = table.get(key)
+
+        if entry is not None:
+            lower, upper = entry
+
+    if lower >= beta or lower == upper:
+        return lower
+    if upper <= alpha:
+        return upper
+
+    alpha = max(alpha, lower)
+    beta = min(beta, upper)
+    score = max(alpha_beta_scores(battle_queue, first_player, alpha, beta,
+                                  table, in_place))
+
+    if table is not None:
+        if score >= beta:
+            lower = score
+        elif score <= alpha:
+            upper = score
+        else:
+            lower = upper = score
+
+        table.put(key, (lower, upper))
+
+    return score
+
+def alpha_beta_scores(battle_queue, first_player, alpha=float('-inf'),
+                      beta=float('inf'), table: TranspositionTable = None,
+                      in_place: bool = False) -> List:
+    """
+    returns the alpha_beta() score of each move for first_player, in the
+    order of get_available_actions()
+
+    a move is only searched for scores above alpha or above the best move
+    before it, so every move but the best one may get a bound instead of its
+    real score. the list stops early once a score reaches beta.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(3)
+    >>> mage.set_hp(7)
+    >>> mage.set_sp(30)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> alpha_beta_scores(bq, bq.peek().get_name())
+    [-20, 7]
+    >>> alpha_beta_scores(bq, bq.peek().get_name(), in_place=True)
+    [-20, 7]
+    """
+    scores = []
+    best = float('-inf')
+
+    for action in battle_queue.peek().get_available_actions():
+        if in_place:
+            undo = make_move(battle_queue, action)
+            score = alpha_beta(battle_queue, first_player, max(alpha, best),
+                               beta, table, True)
+            unmake_move(battle_queue, undo)
+        else:
+            child = make_child(battle_queue, action)
+            score = alpha_beta(child, first_player, max(alpha, best), beta,
+                               table)
+
+        scores.append(score)
+        best = max(best, score)
+
+        if best >= beta:
+            break
+
+    return scores
+
+
+
+
+def itarate_the_recursion(battle_queue, depth_limit: int = None,
+                          evaluator: Evaluator = None,
+                          table: TranspositionTable = None,
+                          budget: SearchBudget = None,
+                          cut_off: List[int] = None) -> List:
+
+    """
+    returns the root of the game tree of battle_queue as a
+    [name, score, BattleQueue, children, depth] list, where children holds
+    the score of each move for the next player
+
+    a node's children are discarded as soon as its score is known, so only
+    the nodes on the path being searched and their siblings are kept: the
+    memory used grows with the depth of the game, not the size of its tree
+
+    if depth_limit is given, states depth_limit moves ahead are not searched
+    any further and are scored with evaluator (DEFAULT_EVALUATOR if it is
+    None) unless the game is over. the number of states scored that way is
+    added to cut_off[0], if cut_off is given
+
+    if table is given and there is no depth_limit, the scores of the states
+    below battle_queue are looked up in it before they are searched and
+    stored in it once they are solved, the same way producer() uses it
+
+    if budget is given, it is spent on every state expanded, so the search
+    raises OutOfBudget once it runs out, whether or not table is used
 
     >>> from a2_battle_queue import BattleQueue
     >>> from a2_characters import Rogue, Mage
@@ -242,15 +530,33 @@ def itarate_the_recursion(battle_queue) -> List:
     >>> bq.add(r)
     >>> itarate_the_recursion(bq)[1]
     7
+    >>> t = TranspositionTable()
+    >>> itarate_the_recursion(bq, table=t)[1]
+    7
+    >>> [child[1] for child in itarate_the_recursion(bq, table=t)[3]]
+    [-20, 7]
+    >>> itarate_the_recursion(bq, 1)[1]
+    7
+    >>> [child[1] for child in itarate_the_recursion(bq)[3]]
+    [-20, 7]
+    >>> [child[2:4] for child in itarate_the_recursion(bq)[3]]
+    [[None, []], [None, []]]
     """
 
+    if evaluator is None:
+        evaluator = DEFAULT_EVALUATOR
+    if depth_limit is not None:
+        table = None
+
     score = None
     name = 1
     children = []
-    m = [name, score, battle_queue, children]
+    m = [name, score, battle_queue, children, 0]
     thing = Stack()
     thing.add(m)
     first_player = battle_queue.peek().get_name()
+    # the table keys of the nodes that are being searched, by name
+    keys = {}
 
 
     while not thing.is_empty():
@@ -272,8 +578,33 @@ def itarate_the_recursion(battle_queue) -> List:
                 j += [i[1]]
             x[1] = max(j)
 
+            if x[0] in keys:
+                table.put(keys.pop(x[0]), x[1])
+
+            # x is solved, so only the scores of its children are needed
+            for i in x[3]:
+                i[2] = None
+                i[3] = []
+
+        elif depth_limit is not None and x[4] >= depth_limit:
+            x[1] = evaluator.evaluate(x[2], first_player)
+
+            if cut_off is not None:
+                cut_off[0] += 1
 
         elif not x[2].is_over():
+            if table is not None and x is not m:
+                key = table_key(x[2], first_player)
+                x[1] = table.get(key)
+
+                if x[1] is not None:
+                    continue
+
+                keys[x[0]] = key
+
+            if budget is not None:
+                budget.spend()
+
             thing.add(x)
 
             moves = x[2].peek().get_available_actions()
@@ -289,24 +620,258 @@ def itarate_the_recursion(battle_queue) -> List:
                 if not clone.is_empty():
                     clone.remove()
 
-                new_tree = [name, None, clone, []]
+                new_tree = [name, None, clone, [], x[4] + 1]
 
                 x[3].append(new_tree)
                 thing.add(new_tree)
     return m
 
+def iterative_scores(battle_queue, first_player,
+                     table: TranspositionTable = None, depth_limit: int = None,
+                     evaluator: Evaluator = None, time_budget: float = None,
+                     node_budget: int = None,
+                     stop: threading.Event = None) -> List:
+    """
+    returns the scores of each move for the next player in battle_queue,
+    found with itarate_the_recursion(battle_queue, depth_limit, evaluator,
+    table), which raises OutOfBudget soon after stop is set, if given
+
+    if time_budget or node_budget is given, the game is searched one move
+    deeper at a time, like deepening_scores() does, until the whole game
+    or depth_limit moves have been searched or time_budget seconds or
+    node_budget expanded states have been used up, and the scores of the
+    deepest search that finished are returned. the first move is always
+    searched completely.
+
+    first_player is accepted so that this can be used like producer(); the
+    next player in battle_queue is always the one scored.
 
-class RecursiveMiniMax(Playstyle):
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(3)
+    >>> mage.set_hp(7)
+    >>> mage.set_sp(30)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> iterative_scores(bq, bq.peek().get_name())
+    [-20, 7]
+    >>> r.set_sp(20)
+    >>> mage.set_hp(27)
+    >>> mage.set_sp(40)
+    >>> iterative_scores(bq, "m", node_budget=0)
+    [10, 27]
+    >>> iterative_scores(bq, "m", node_budget=1000)
+    [20, 27]
     """
-    The Recursive Playstyle. Inherits from Playstyle.
+    if time_budget is None and node_budget is None:
+        budget = SearchBudget(stop=stop) if stop is not None else None
+
+        return [child[1] for child in
+                itarate_the_recursion(battle_queue, depth_limit, evaluator,
+                                      table, budget)[3]]
+
+    budget = SearchBudget(time_budget, node_budget, stop)
+    depth = 1
+    cut_off = [0]
+    scores = [child[1] for child in
+              itarate_the_recursion(battle_queue, depth, evaluator, None,
+                                    SearchBudget(stop=stop), cut_off)[3]]
+
+    while cut_off[0] and (depth_limit is None or depth < depth_limit):
+        depth += 1
+        cut_off = [0]
+
+        try:
+            scores = [child[1] for child in
+                      itarate_the_recursion(battle_queue, depth, evaluator,
+                                            None, budget, cut_off)[3]]
+        except OutOfBudget:
+            if stop is not None and stop.is_set():
+                raise
+            break
+
+    return scores
+
+def in_place_alpha_beta_scores(battle_queue, first_player,
+                               table: TranspositionTable = None) -> List:
+    """
+    returns alpha_beta_scores(battle_queue, first_player, table=table),
+    playing moves on battle_queue itself instead of on copies
     """
+    return alpha_beta_scores(battle_queue, first_player, table=table,
+                             in_place=True)
+
+SEARCH_ENGINES = {'minimax': producer,
+                  'alphabeta': alpha_beta_scores,
+                  'iterative': iterative_scores,
+                  'inplace': in_place_scores,
+                  'alphabeta-inplace': in_place_alpha_beta_scores,
+                  'parallel': parallel_scores,
+                  'deepening': deepening_scores,
+                  'iterative-array': array_scores,
+                  'levels': level_scores
+                 }
+
+# The engines that can stop at a depth_limit, or when a time_budget or
+# node_budget runs out, and score the games there with an evaluator.
+LIMITED_ENGINES = ('deepening', 'iterative')
+# The engines that search BattleStates, which assume Sorcerers use the
+# default SkillDecisionTree.
+STATE_ENGINES = ('parallel', 'iterative-array', 'levels')
+# The engines that are given the Event that stops a pondering search. The
+# others look every state up in their table, which checks it (see
+# BudgetedTable).
+STOPPABLE_ENGINES = ('deepening', 'iterative', 'parallel')
+
+def search_root(battle_queue, engine: str = 'minimax',
+                table: TranspositionTable = None,
+                tablebase: Tablebase = None, cache: ResultCache = None,
+                **options: Any) -> Tuple[str, int, List]:
+    """
+    returns the best move for the next player in battle_queue, its score and
+    the scores of every available move, searching the game tree only once
 
-    def __init__(self, battle_queue: 'BattleQueue') -> None:
+    engine is one of SEARCH_ENGINES and options are passed on to it, e.g.
+    workers and split_depth for 'parallel', or depth_limit and evaluator
+    for 'iterative' and 'deepening'. with 'alphabeta', the scores of
+    moves other than the best one may be bounds (see alpha_beta_scores()).
+    the best move is 'X' if the next player cannot move.
+
+    if a Sorcerer in battle_queue doesn't use the default
+    SkillDecisionTree, the engines in STATE_ENGINES can't play its attacks,
+    so 'minimax' searches instead, and tablebase and cache aren't used.
+
+    if tablebase is given and has the scores of every move, they are read
+    from it instead of being searched.
+
+    if cache is given, the result is looked up in it first and stored in it
+    after searching, unless the search may have stopped early
+    ('deepening', a depth_limit or a budget) or both players have the same
+    name. a result found in
+    cache may have been stored by a different engine, so its scores other
+    than the best one may be bounds.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = mage
+    >>> mage.enemy = r
+    >>> r.set_hp(30)
+    >>> r.set_sp(3)
+    >>> mage.set_hp(7)
+    >>> mage.set_sp(30)
+    >>> bq.add(mage)
+    >>> bq.add(r)
+    >>> search_root(bq)
+    ('S', 7, [-20, 7])
+    >>> search_root(bq, 'iterative')
+    ('S', 7, [-20, 7])
+    >>> search_root(bq, 'alphabeta', TranspositionTable())
+    ('S', 7, [-20, 7])
+    >>> import os, tempfile
+    >>> from a2_result_cache import ResultCache
+    >>> cache = ResultCache(os.path.join(tempfile.mkdtemp(), 'c.sqlite'))
+    >>> search_root(bq, cache=cache) == search_root(bq, cache=cache)
+    True
+    >>> (cache.hits, cache.misses)
+    (1, 1)
+    >>> cache.close()
+    >>> from a2_characters import Sorcerer
+    >>> from a2_skill_decision_tree import SkillDecisionTree, general
+    >>> from a2_skills import MAGE_SPECIAL
+    >>> bq = BattleQueue()
+    >>> s = Sorcerer("s", bq, ManualPlaystyle(bq))
+    >>> mage = Mage("m", bq, ManualPlaystyle(bq))
+    >>> s.enemy = mage
+    >>> mage.enemy = s
+    >>> s.set_hp(10)
+    >>> s.set_sp(30)
+    >>> mage.set_hp(20)
+    >>> mage.set_sp(10)
+    >>> bq.add(s)
+    >>> bq.add(mage)
+    >>> s.set_skill_decision_tree(SkillDecisionTree(MAGE_SPECIAL, general,
+    ...                                             1))
+    >>> search_root(bq, 'levels')
+    ('A', 10, [10, 0])
+    """
+    next_player = battle_queue.peek()
+    actions = next_player.get_available_actions()
+
+    if not actions:
+        return 'X', terminal_score(battle_queue, next_player.get_name()), []
+
+    if engine in STATE_ENGINES and not uses_default_trees(battle_queue):
+        engine = 'minimax'
+        options = {}
+
+    p1, p2 = battle_queue.get_players()
+    cacheable = cache is not None and p1.get_name() != p2.get_name() and \
+        engine != 'deepening' and \
+        all(options.get(name) is None
+            for name in ('depth_limit', 'time_budget', 'node_budget'))
+
+    if cacheable:
+        result = cache.lookup(battle_queue)
+
+        if result is not None:
+            return result
+
+    scores = None
+
+    if tablebase is not None:
+        scores = tablebase_scores(battle_queue, next_player.get_name(),
+                                  tablebase)
+
+    if scores is None:
+        scores = SEARCH_ENGINES[engine](battle_queue.copy(),
+                                        next_player.get_name(), table=table,
+                                        **options)
+    best = max(scores)
+    result = actions[scores.index(best)], best, scores
+
+    if cacheable:
+        cache.store(battle_queue, result)
+
+    return result
+
+
+class SearchPlaystyle(Playstyle):
+    """
+    An abstract superclass for the minimax Playstyles, which search for
+    their moves with search_root() and can ponder.
+
+    table - the TranspositionTable holding the scores of states this
+            Playstyle has already solved, kept between turns.
+    cache - the ResultCache moves are looked up in and stored in, or None.
+    pondering - whether this Playstyle searches the positions the
+                opponent's move can lead to while the opponent is deciding
+                (see a2_ponder and start_pondering()).
+    """
+    table: TranspositionTable
+    cache: ResultCache
+    pondering: bool
+
+    def __init__(self, battle_queue: 'BattleQueue', table_size: int,
+                 cache: ResultCache, pondering: bool) -> None:
         """
-        Initialize this RecursiveMinimax with BattleQueue as its battle queue.
+        Initialize this SearchPlaystyle with BattleQueue as its battle
+        queue, remembering the scores of at most table_size states.
         """
         super().__init__(battle_queue)
         self.is_manual = False
+        self.table = TranspositionTable(table_size)
+        self.cache = cache
+        self.pondering = pondering
+        self._ponderer = None
 
     def select_attack(self, parameter: Any = None) -> str:
         """
@@ -317,37 +882,408 @@ class RecursiveMiniMax(Playstyle):
 
         Return 'X' if a valid move cannot be found.
         """
-        move = get_state_score(self.battle_queue)
-        potentials = self.battle_queue.peek().get_available_actions()
+        result = None
 
-        if (potentials) == []:
-            return 'X'
+        if self._ponderer is not None:
+            result = self._ponderer.take(self.battle_queue)
 
-        who = producer(self.battle_queue.copy(),
-                       self.battle_queue.peek().get_name())
+        if result is None:
+            result = self._search(self.battle_queue, self.cache)
 
-        x = who.index(move)
+        return result[0]
 
-        return potentials[x]
+    def start_pondering(self) -> None:
+        """
+        Start searching the positions the move of the next character in
+        this Playstyle's battle_queue, the opponent, can lead to, if
+        pondering is on. The search goes on in the background until
+        select_attack() is called, which stops it wherever it is.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, RecursiveMiniMax(bq, pondering=True))
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> r.set_sp(20)
+        >>> m.set_sp(20)
+        >>> bq.add(m)
+        >>> bq.add(r)
+        >>> r.playstyle.start_pondering()
+        >>> m.attack()
+        >>> bq.remove()
+        m (Mage): 100/15
+        >>> r.playstyle.select_attack()
+        'A'
+        """
+        if self.pondering:
+            if self._ponderer is None:
+                # Only the positions really reached are stored in the
+                # ResultCache, so pondering doesn't fill it with guesses.
+                self._ponderer = Ponderer(
+                    lambda battle_queue, stop:
+                    self._search(battle_queue, None, stop))
+
+            self._ponderer.start(self.battle_queue)
+
+    def _search(self, battle_queue: 'BattleQueue', cache: ResultCache,
+                stop: threading.Event = None) -> Tuple[str, int, List]:
+        """
+        Return search_root() of battle_queue with this Playstyle's search
+        settings, looking the result up in and storing it in cache. If stop
+        is given, the search raises OutOfBudget soon after it is set.
+        """
+        raise NotImplementedError
+
+    def _search_table(self, stop: threading.Event) \
+            -> Union[TranspositionTable, BudgetedTable]:
+        """
+        Return the table a search stopped by stop uses: this Playstyle's
+        table, looked up in through a BudgetedTable if stop isn't None.
+        """
+        if stop is None:
+            return self.table
+
+        return BudgetedTable(self.table, SearchBudget(stop=stop))
+
+
+class RecursiveMiniMax(SearchPlaystyle):
+    """
+    The Recursive Playstyle. Inherits from Playstyle.
+
+    table - the TranspositionTable holding the scores of states this
+            Playstyle has already solved. It is kept between turns, and
+            whatever moves were played since the last search, by either
+            player, the new state was below the last one, so its subtree
+            is already solved.
+    engine - the search used to pick moves, one of SEARCH_ENGINES:
+             'minimax' searches every move, 'alphabeta' skips the moves that
+             cannot beat the best one found so far. 'inplace' and
+             'alphabeta-inplace' do the same without copying the
+             BattleQueue for every move. 'parallel' solves the subtrees
+             split_depth moves below the current state in up to workers
+             processes. 'iterative' searches without recursion, like an
+             IterativeMiniMax, and 'iterative-array' does so storing the
+             game tree in arrays. 'levels' expands the game
+             one move deeper at a time, merging identical states. All of
+             them pick the same move. 'deepening' searches
+             one move deeper at a time and stops when it runs out of budget,
+             so it may pick a different move when the budget is too small to
+             search the whole game, and so may 'iterative' with a
+             depth_limit.
+    workers - the number of processes used by 'parallel', or None for one
+              per CPU.
+    split_depth - how many moves below the current state 'parallel' splits
+                  the search into separate subtrees.
+    pool - the SearchPool 'parallel' solves subtrees in, kept between turns
+           and shared with the copies of this Playstyle until shutdown() is
+           called.
+    time_budget - how many seconds 'deepening' or 'iterative' may search
+                  for, or None.
+    node_budget - how many states 'deepening' or 'iterative' may expand, or
+                  None.
+    depth_limit - how many moves ahead 'deepening' or 'iterative' may
+                  search, or None. The other engines can't stop early.
+    evaluator - the Evaluator 'deepening' or 'iterative' scores unfinished
+                games with, or None for DEFAULT_EVALUATOR.
+    tablebase - the Tablebase moves are looked up in before searching, or
+                None.
+    cache - the ResultCache moves are looked up in and stored in, or None.
+    pondering - whether this Playstyle searches the positions the
+                opponent's move can lead to while the opponent is deciding
+                (see a2_ponder and start_pondering()).
+    """
+    table: TranspositionTable
+    engine: str
+    workers: int
+    split_depth: int
+    pool: SearchPool
+    time_budget: float
+    node_budget: int
+    depth_limit: int
+    evaluator: Evaluator
+    tablebase: Tablebase
+    cache: ResultCache
+    pondering: bool
+
+    def __init__(self, battle_queue: 'BattleQueue',
+                 table_size: int = DEFAULT_TABLE_SIZE,
+                 engine: str = 'minimax', workers: int = None,
+                 split_depth: int = 1, time_budget: float = None,
+                 node_budget: int = None, depth_limit: int = None,
+                 evaluator: Evaluator = None,
+                 tablebase: Tablebase = None,
+                 cache: ResultCache = None, pondering: bool = False,
+                 pool: SearchPool = None) -> None:
+        """
+        Initialize this RecursiveMinimax with BattleQueue as its battle queue,
+        remembering the scores of at most table_size states and searching
+        with engine. 'parallel' uses pool, or a new SearchPool of up to
+        workers processes if pool is None; its processes are only started
+        by the first search.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> RecursiveMiniMax(BattleQueue(), engine='astar')
+        Traceback (most recent call last):
+        ...
+        ValueError: unknown search engine 'astar'
+        >>> RecursiveMiniMax(BattleQueue(), depth_limit=3)
+        Traceback (most recent call last):
+        ...
+        ValueError: depth_limit can't be used with the 'minimax' engine
+        """
+        if engine not in SEARCH_ENGINES:
+            raise ValueError("unknown search engine '{}'".format(engine))
+        if engine not in LIMITED_ENGINES:
+            for name, value in (('time_budget', time_budget),
+                                ('node_budget', node_budget),
+                                ('depth_limit', depth_limit),
+                                ('evaluator', evaluator)):
+                if value is not None:
+                    raise ValueError(
+                        "{} can't be used with the '{}' engine".format(
+                            name, engine))
+
+        super().__init__(battle_queue, table_size, cache, pondering)
+        self.engine = engine
+        self.workers = workers
+        self.split_depth = split_depth
+        self.pool = pool if pool is not None else SearchPool(workers)
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.depth_limit = depth_limit
+        self.evaluator = evaluator
+        self.tablebase = tablebase
+
+    def _search(self, battle_queue: 'BattleQueue', cache: ResultCache,
+                stop: threading.Event = None) -> Tuple[str, int, List]:
+        """
+        Return search_root() of battle_queue with this Playstyle's engine,
+        table and tablebase, and cache.
+        """
+        options = self._engine_options()
+
+        if stop is not None and self.engine in STOPPABLE_ENGINES:
+            options['stop'] = stop
+
+        return search_root(battle_queue, self.engine,
+                           self._search_table(stop), self.tablebase, cache,
+                           **options)
+
+    def _engine_options(self) -> dict:
+        """
+        Return the options this RecursiveMiniMax passes on to its engine.
+        """
+        if self.engine == 'parallel':
+            return {'workers': self.workers, 'split_depth': self.split_depth,
+                    'pool': self.pool}
+        elif self.engine == 'deepening':
+            return {'time_budget': self.time_budget,
+                    'node_budget': self.node_budget,
+                    'depth_limit': self.depth_limit,
+                    'evaluator': self.evaluator}
+        elif self.engine == 'iterative':
+            return {'time_budget': self.time_budget,
+                    'node_budget': self.node_budget,
+                    'depth_limit': self.depth_limit,
+                    'evaluator': self.evaluator}
+
+        return {}
 
     def copy(self, new_battle_queue: 'BattleQueue') -> 'Playstyle':
         """
         Return a copy of this Recursive Minimax which uses the
         BattleQueue new_battle_queue.
         """
-        return RecursiveMiniMax(new_battle_queue)
+        return RecursiveMiniMax(new_battle_queue, self.table.max_size,
+                                self.engine, self.workers, self.split_depth,
+                                self.time_budget, self.node_budget,
+                                self.depth_limit, self.evaluator,
+                                self.tablebase, self.cache, self.pondering,
+                                self.pool)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the worker processes of this RecursiveMiniMax's pool, if they
+        were started, waiting for them if wait.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, RecursiveMiniMax(bq, engine='parallel',
+        ...                                     workers=2, split_depth=2))
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> r.set_sp(20)
+        >>> m.set_sp(20)
+        >>> bq.add(r)
+        >>> bq.add(m)
+        >>> r.playstyle.select_attack()
+        'A'
+        >>> r.playstyle.pool is bq.copy().peek().playstyle.pool
+        True
+        >>> r.playstyle.shutdown()
+        """
+        self.pool.shutdown(wait)
 
-class IterativeMiniMax(Playstyle):
+class IterativeMiniMax(SearchPlaystyle):
     """
     The Itarative Playstyle. Inherits from Playstyle.
+
+    depth_limit - how many moves ahead this Playstyle searches, or None to
+                  search until every game is over.
+    time_budget - how many seconds this Playstyle may search for, or None.
+    node_budget - how many states this Playstyle may expand, or None. With
+                  a budget, the game is searched one move deeper at a time
+                  and the deepest search that finished is used (see
+                  iterative_scores()).
+    evaluator - the Evaluator that scores games that aren't over at
+                depth_limit or when the budget runs out, or None for
+                DEFAULT_EVALUATOR.
+    tablebase - the Tablebase moves are looked up in before searching, or
+                None.
+    array_store - whether the game tree is stored in arrays (see
+                  a2_node_store) instead of lists, which takes much less
+                  memory but can't be used with a depth_limit or a
+                  budget.
+    cache - the ResultCache moves are looked up in and stored in, or None.
+    table - the TranspositionTable holding the scores of states this
+            Playstyle has already solved, kept between turns like the
+            table of a RecursiveMiniMax. Not used with a depth_limit.
+    pondering - whether this Playstyle searches the positions the
+                opponent's move can lead to while the opponent is deciding,
+                like a RecursiveMiniMax.
     """
+    depth_limit: int
+    time_budget: float
+    node_budget: int
+    evaluator: Evaluator
+    tablebase: Tablebase
+    array_store: bool
+    cache: ResultCache
+    table: TranspositionTable
+    pondering: bool
+
+    def __init__(self, battle_queue: 'BattleQueue', depth_limit: int = None,
+                 evaluator: Evaluator = None,
+                 tablebase: Tablebase = None,
+                 array_store: bool = False,
+                 cache: ResultCache = None,
+                 table_size: int = DEFAULT_TABLE_SIZE,
+                 pondering: bool = False, time_budget: float = None,
+                 node_budget: int = None) -> None:
+        """
+        Initialize this Iterative minimax with BattleQueue as its battle queue,
+        searching depth_limit moves ahead, or until time_budget or
+        node_budget runs out, and scoring the games that aren't over there
+        with evaluator, and remembering the scores of at most table_size
+        states.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> IterativeMiniMax(BattleQueue(), 3, array_store=True)
+        Traceback (most recent call last):
+        ...
+        ValueError: array_store can't be used with a depth_limit
+        >>> IterativeMiniMax(BattleQueue(), array_store=True, node_budget=5)
+        Traceback (most recent call last):
+        ...
+        ValueError: array_store can't be used with a node_budget
+        """
+        if array_store:
+            for name, value in (('depth_limit', depth_limit),
+                                ('time_budget', time_budget),
+                                ('node_budget', node_budget)):
+                if value is not None:
+                    raise ValueError(
+                        "array_store can't be used with a {}".format(name))
+
+        super().__init__(battle_queue, table_size, cache, pondering)
+        self.depth_limit = depth_limit
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.evaluator = evaluator
+        self.tablebase = tablebase
+        self.array_store = array_store
+
+    def _search(self, battle_queue: 'BattleQueue', cache: ResultCache,
+                stop: threading.Event = None) -> Tuple[str, int, List]:
+        """
+        Return search_root() of battle_queue with this Playstyle's search
+        settings, table and tablebase, and cache.
+        """
+        if self.array_store:
+            return search_root(battle_queue, 'iterative-array',
+                               self._search_table(stop), self.tablebase,
+                               cache)
+
+        return search_root(battle_queue, 'iterative',
+                           self._search_table(stop), self.tablebase, cache,
+                           depth_limit=self.depth_limit,
+                           evaluator=self.evaluator,
+                           time_budget=self.time_budget,
+                           node_budget=self.node_budget, stop=stop)
 
-    def __init__(self, battle_queue: 'BattleQueue') -> None:
+    def copy(self, new_battle_queue: 'BattleQueue') -> 'Playstyle':
         """
-        Initialize this Iterative minimax with BattleQueue as its battle queue.
+        Return a copy of this Itarative minimax which uses the
+        BattleQueue new_battle_queue.
+        """
+        return IterativeMiniMax(new_battle_queue, self.depth_limit,
+                                self.evaluator, self.tablebase,
+                                self.array_store, self.cache,
+                                self.table.max_size, self.pondering,
+                                self.time_budget, self.node_budget)
+
+class MonteCarloPlaystyle(Playstyle):
+    """
+    The Monte Carlo tree search Playstyle. Inherits from Playstyle.
+
+    Unlike the minimax Playstyles, it doesn't search the whole game, so it
+    can pick a move in games that are too large to solve. Its search tree is
+    kept between turns, so what it learned about the moves that were made
+    is used again.
+
+    search - the MCTSSearch this Playstyle picks moves with.
+    playouts - how many random games are played for each move.
+    time_budget - how many seconds are spent on each move instead, or None
+                  to play playouts games.
+    """
+    search: MCTSSearch
+    playouts: int
+    time_budget: float
+
+    def __init__(self, battle_queue: 'BattleQueue',
+                 playouts: int = DEFAULT_PLAYOUTS, time_budget: float = None,
+                 exploration: float = DEFAULT_EXPLORATION,
+                 seed: int = None) -> None:
+        """
+        Initialize this MonteCarloPlaystyle with BattleQueue as its battle
+        queue, playing playouts random games (or as many as fit in
+        time_budget seconds) for each move, seeded with seed.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> mage = Mage("m", bq, MonteCarloPlaystyle(bq, 200, seed=0))
+        >>> r.enemy = mage
+        >>> mage.enemy = r
+        >>> r.set_hp(30)
+        >>> r.set_sp(3)
+        >>> mage.set_hp(7)
+        >>> mage.set_sp(30)
+        >>> bq.add(mage)
+        >>> bq.add(r)
+        >>> mage.playstyle.select_attack()
+        'S'
         """
         super().__init__(battle_queue)
         self.is_manual = False
+        self.search = MCTSSearch(exploration, seed)
+        self.playouts = playouts
+        self.time_budget = time_budget
 
     def select_attack(self, parameter: Any = None) -> str:
         """
@@ -358,25 +1294,85 @@ class IterativeMiniMax(Playstyle):
 
         Return 'X' if a valid move cannot be found.
         """
-        move = itarate_the_recursion(self.battle_queue)[1]
+        return mcts_action(self.battle_queue, self.search, self.playouts,
+                           self.time_budget)
+
+    def copy(self, new_battle_queue: 'BattleQueue') -> 'Playstyle':
+        """
+        Return a copy of this MonteCarloPlaystyle which uses the
+        BattleQueue new_battle_queue, starting with a new search tree.
+        """
+        return MonteCarloPlaystyle(new_battle_queue, self.playouts,
+                                   self.time_budget,
+                                   self.search.exploration)
+
+class ExpectimaxPlaystyle(Playstyle):
+    """
+    The Expectimax Playstyle. Inherits from Playstyle.
+
+    Against an enemy with a RandomPlaystyle, the enemy's moves are treated
+    as chance nodes (see a2_expectimax), so moves are picked for the best
+    expected score instead of assuming the enemy plays its best. Against
+    any other enemy, it plays like a RecursiveMiniMax using 'alphabeta'.
+
+    table - the TranspositionTable holding the scores of states this
+            Playstyle has already solved, kept between turns.
+    """
+    table: TranspositionTable
+
+    def __init__(self, battle_queue: 'BattleQueue',
+                 table_size: int = DEFAULT_TABLE_SIZE) -> None:
+        """
+        Initialize this ExpectimaxPlaystyle with BattleQueue as its battle
+        queue, remembering the scores of at most table_size states.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, ExpectimaxPlaystyle(bq))
+        >>> m = Mage("m", bq, RandomPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> r.set_hp(10)
+        >>> r.set_sp(10)
+        >>> m.set_hp(8)
+        >>> m.set_sp(30)
+        >>> bq.add(r)
+        >>> bq.add(m)
+        >>> r.playstyle.select_attack()
+        'S'
+        """
+        super().__init__(battle_queue)
+        self.is_manual = False
+        self.table = TranspositionTable(table_size)
 
-        potentials = self.battle_queue.peek().get_available_actions()
+    def select_attack(self, parameter: Any = None) -> str:
+        """
+        Return the attack for the next character in this Playstyle's
+        battle_queue to perform.
 
-        if (potentials) == []:
-            return potentials[0]
-        elif (potentials) == []:
+        parameter represents a key pressed by a player.
+
+        Return 'X' if a valid move cannot be found.
+        """
+        character = self.battle_queue.peek()
+        actions = character.get_available_actions()
+
+        if not actions:
             return 'X'
 
-        m = []
-        for i in itarate_the_recursion(self.battle_queue)[3]:
-            m += [i[1]]
-        return potentials[m.index(move)]
+        if not isinstance(character.enemy.playstyle, RandomPlaystyle):
+            return search_root(self.battle_queue, 'alphabeta-inplace',
+                               self.table)[0]
 
+        scores = expectimax_scores(self.battle_queue.copy(),
+                                   character.get_name(), table=self.table)
 
+        return actions[scores.index(max(scores))]
 
     def copy(self, new_battle_queue: 'BattleQueue') -> 'Playstyle':
         """
-        Return a copy of this Itarative minimax which uses the
+        Return a copy of this ExpectimaxPlaystyle which uses the
         BattleQueue new_battle_queue.
         """
-        return IterativeMiniMax(new_battle_queue)
+        return ExpectimaxPlaystyle(new_battle_queue, self.table.max_size)
@@ -0,0 +1,205 @@
+"""
+Pondering: searching ahead on a background thread while the opponent is
+deciding on a move.
+
+When it is the opponent's turn, a Ponderer works out every position its
+move can lead to, up to the next time the pondering player has to move,
+and searches them one by one on a background thread. Once the opponent has
+moved, take() stops the thread and hands over the result for the position
+that was actually reached, if it was searched in time. The search is given
+the Event that stops it, so it can give up on a position it is in the
+middle of (see SearchBudget and BudgetedTable in a2_iterative_deepening).
+"""
+from typing import Callable, List, Tuple, Union
+import threading
+from a2_iterative_deepening import OutOfBudget
+
+DEFAULT_MAX_POSITIONS = 8
+
+
+def reply_positions(battle_queue: 'BattleQueue',
+                    max_positions: int = DEFAULT_MAX_POSITIONS) \
+        -> List['BattleQueue']:
+    """
+    Return copies of the positions the next player in battle_queue can
+    leave the game in for the other player to move in, at most
+    max_positions of them, with moves played the way perform_attack() in
+    a2_game plays them. Positions where the game is over are left out.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> m = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = m
+    >>> m.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(m)
+    >>> reply_positions(bq)  # doctest: +NORMALIZE_WHITESPACE
+    [m (Mage): 93/100 -> r (Rogue): 100/97,
+     m (Mage): 88/100 -> r (Rogue): 100/90 -> r (Rogue): 100/90]
+    """
+    mover = battle_queue.peek().get_name()
+    to_visit = [battle_queue.copy()]
+    positions = []
+
+    while to_visit and len(positions) < max_positions:
+        position = to_visit.pop(0)
+
+        if position.is_over():
+            continue
+        elif position.peek().get_name() != mover:
+            positions.append(position)
+        else:
+            for action in position.peek().get_available_actions():
+                to_visit.append(_play(position, action))
+
+    return positions
+
+
+def _play(battle_queue: 'BattleQueue', action: str) -> 'BattleQueue':
+    """
+    Return a copy of battle_queue after its next character performs action,
+    the way perform_attack() in a2_game plays it: the character is only
+    removed from the queue if it can still act.
+    """
+    position = battle_queue.copy()
+    character = position.peek()
+
+    if action == 'A':
+        character.attack()
+    else:
+        character.special_attack()
+
+    if character.get_available_actions() != []:
+        position.remove()
+
+    return position
+
+
+class Ponderer:
+    """
+    Searches the positions an opponent's move can lead to on a background
+    thread.
+
+    search - the function that searches a position, returning its best
+             move, that move's score and the score of every move. It is
+             also given an Event, and should raise OutOfBudget soon after
+             the Event is set.
+    max_positions - the most positions searched while the opponent is
+                    deciding.
+    """
+    search: Callable[['BattleQueue', threading.Event],
+                     Tuple[str, int, List[int]]]
+    max_positions: int
+
+    def __init__(self, search: Callable[['BattleQueue', threading.Event],
+                                        Tuple[str, int, List[int]]],
+                 max_positions: int = DEFAULT_MAX_POSITIONS) -> None:
+        """
+        Initialize this Ponderer, which searches positions with search.
+        """
+        self.search = search
+        self.max_positions = max_positions
+        self._results = {}
+        self._pondered = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, battle_queue: 'BattleQueue') -> None:
+        """
+        Start searching the positions the next player in battle_queue can
+        leave the game in, unless they are already being searched.
+
+        battle_queue is copied before this returns, so it can be changed
+        while the search goes on.
+        """
+        key = battle_queue.get_signature()
+
+        if key == self._pondered:
+            return
+
+        self.stop()
+        self._results = {}
+        self._pondered = key
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(reply_positions(battle_queue, self.max_positions),),
+            daemon=True)
+        self._thread.start()
+
+    def _run(self, positions: List['BattleQueue']) -> None:
+        """
+        Search positions until they are all searched or this Ponderer is
+        stopped.
+        """
+        for position in positions:
+            if self._stop.is_set():
+                return
+
+            key = position.get_signature()
+
+            try:
+                self._results[key] = self.search(position, self._stop)
+            except OutOfBudget:
+                return
+
+    def wait(self) -> None:
+        """
+        Wait until every position has been searched.
+        """
+        if self._thread is not None:
+            self._thread.join()
+
+    def stop(self) -> None:
+        """
+        Stop searching, waiting for the search of the current position to
+        give up.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def take(self, battle_queue: 'BattleQueue') \
+            -> Union[Tuple[str, int, List[int]], None]:
+        """
+        Stop searching and return the result for battle_queue, or None if
+        it wasn't searched.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> from a2_playstyle import ManualPlaystyle, search_root
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> r.set_hp(30)
+        >>> r.set_sp(3)
+        >>> m.set_hp(20)
+        >>> m.set_sp(30)
+        >>> bq.add(r)
+        >>> bq.add(m)
+        >>> ponderer = Ponderer(lambda position, stop: search_root(position))
+        >>> ponderer.start(bq)
+        >>> ponderer.wait()
+        >>> r.attack()
+        >>> bq
+        r (Rogue): 30/0 -> m (Mage): 13/30 -> r (Rogue): 30/0
+        >>> ponderer.take(bq) == search_root(bq)
+        True
+        >>> ponderer.take(bq) is None
+        True
+        """
+        self.stop()
+        # The positions were peeked at, which drops the players at the front
+        # who can't act, when they were pondered.
+        battle_queue.peek()
+        result = self._results.get(battle_queue.get_signature())
+        self._results = {}
+        self._pondered = None
+
+        return result
@@ -0,0 +1,331 @@
+"""
+A persistent cache of the moves the minimax Playstyles picked, kept in an
+SQLite file so that it is shared by every game played with that file.
+
+Each entry is keyed by the Zobrist hash of a game (BattleQueue.get_hash())
+and holds the best move of the next player, its score and the scores of
+every move, exactly as search_root() in a2_playstyle returned them. The
+entry also holds the game's signature, which is compared on every lookup,
+so a game whose hash collides with another's never gets its result.
+
+Writes are kept in memory and written to the file in batches of
+batch_size. Once the file holds more than max_entries entries, the least
+recently used ones are dropped. The file records SCHEMA_VERSION and a
+fingerprint of the rules of the game (rules_fingerprint() in
+a2_battle_state), and a file with a different version or fingerprint is
+emptied when it is opened, so results from a game with different rules are
+never used. The fingerprint only covers the default SkillDecisionTree, so
+games with a Sorcerer using another tree are neither looked up nor stored.
+
+A ResultCache can be used from any thread: a lock lets one thread at a
+time use its connection and the entries kept in memory.
+"""
+from typing import List, Tuple, Union
+import sqlite3
+import threading
+from a2_battle_queue import RestrictedBattleQueue
+from a2_battle_state import rules_fingerprint, uses_default_trees
+
+DEFAULT_PATH = 'a2_result_cache.sqlite'
+SCHEMA_VERSION = 2
+DEFAULT_MAX_ENTRIES = 1000000
+DEFAULT_BATCH_SIZE = 64
+
+
+def cache_key(battle_queue: 'BattleQueue') -> Tuple[int, bool]:
+    """
+    Return the key battle_queue's entry is stored under in a ResultCache.
+
+    SQLite integers are signed, so the hash is stored as one.
+    """
+    key = battle_queue.get_hash()
+
+    if key >= 1 << 63:
+        key -= 1 << 64
+
+    return key, isinstance(battle_queue, RestrictedBattleQueue)
+
+
+class ResultCache:
+    """
+    A persistent cache of search_root() results in an SQLite file.
+
+    path - the file this ResultCache is kept in.
+    max_entries - the most entries kept in the file.
+    batch_size - how many new entries are kept in memory before they are
+                 written to the file.
+    hits - the number of lookups that found an entry.
+    misses - the number of lookups that did not find an entry.
+    """
+    path: str
+    max_entries: int
+    batch_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, path: str = DEFAULT_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """
+        Initialize this ResultCache from the file at path, creating it if
+        needed and emptying it if it was made for another SCHEMA_VERSION or
+        other rules.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._used = {}
+        self._clock = 0
+        self._lock = threading.RLock()
+        # The lock keeps threads from using the connection at once.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._set_up()
+
+    def _set_up(self) -> None:
+        """
+        Create the tables of this ResultCache's file, or empty them if they
+        don't match SCHEMA_VERSION and rules_fingerprint().
+        """
+        fingerprint = rules_fingerprint()
+        cursor = self._connection.cursor()
+        cursor.execute("CREATE TABLE IF NOT EXISTS meta "
+                       "(name TEXT PRIMARY KEY, value TEXT)")
+        stored = dict(cursor.execute("SELECT name, value FROM meta"))
+
+        if stored != {'version': str(SCHEMA_VERSION),
+                      'fingerprint': fingerprint}:
+            cursor.execute("DROP TABLE IF EXISTS results")
+            cursor.execute("DELETE FROM meta")
+            cursor.executemany("INSERT INTO meta VALUES (?, ?)",
+                               [('version', str(SCHEMA_VERSION)),
+                                ('fingerprint', fingerprint)])
+
+        cursor.execute("CREATE TABLE IF NOT EXISTS results "
+                       "(hash INTEGER, restricted INTEGER, signature TEXT, "
+                       "action TEXT, score INTEGER, scores TEXT, used INTEGER, "
+                       "PRIMARY KEY (hash, restricted))")
+        cursor.execute("CREATE INDEX IF NOT EXISTS results_used "
+                       "ON results (used)")
+        row = cursor.execute("SELECT MAX(used) FROM results").fetchone()
+        self._clock = row[0] or 0
+        self._connection.commit()
+
+    def lookup(self, battle_queue: 'BattleQueue') \
+            -> Union[Tuple[str, int, List[int]], None]:
+        """
+        Return the best move, its score and the scores of every move stored
+        for battle_queue, or None if there isn't an entry for it or a
+        Sorcerer in battle_queue doesn't use the default SkillDecisionTree.
+
+        >>> import os, tempfile
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> bq.add(r)
+        >>> bq.add(m)
+        >>> path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite')
+        >>> cache = ResultCache(path, batch_size=1)
+        >>> cache.lookup(bq) is None
+        True
+        >>> cache.store(bq, ('S', 7, [-20, 7]))
+        >>> cache.close()
+        >>> cache = ResultCache(path)
+        >>> cache.lookup(bq.copy())
+        ('S', 7, [-20, 7])
+        >>> (cache.hits, cache.misses)
+        (1, 0)
+        >>> from concurrent.futures import ThreadPoolExecutor
+        >>> with ThreadPoolExecutor(1) as worker:
+        ...     worker.submit(cache.lookup, bq).result()
+        ('S', 7, [-20, 7])
+
+        A game whose hash collides with another's doesn't get its result:
+
+        >>> other = bq.copy()
+        >>> other.peek().set_hp(50)
+        >>> _ = cache._connection.execute("UPDATE results SET hash = ?",
+        ...                               cache_key(other)[:1])
+        >>> cache.lookup(other) is None
+        True
+        >>> cache.close()
+        """
+        if not uses_default_trees(battle_queue):
+            return None
+
+        with self._lock:
+            return self._lookup(battle_queue)
+
+    def _lookup(self, battle_queue: 'BattleQueue') \
+            -> Union[Tuple[str, int, List[int]], None]:
+        """
+        Return lookup(battle_queue), with the lock of this ResultCache held.
+        """
+        key = cache_key(battle_queue)
+        signature = repr(battle_queue.get_signature())
+        result = None
+        entry = self._pending.get(key)
+
+        if entry is not None:
+            if entry[0] == signature:
+                result = entry[1]
+        else:
+            row = self._connection.execute(
+                "SELECT signature, action, score, scores FROM results "
+                "WHERE hash = ? AND restricted = ?", key).fetchone()
+
+            if row is not None and row[0] == signature:
+                result = (row[1], row[2],
+                          [int(score) for score in row[3].split(',')])
+                # Mark the entry as used, so it is dropped last. Only its
+                # used column is written by the next flush().
+                self._clock += 1
+                self._used[key] = self._clock
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return result
+
+    def store(self, battle_queue: 'BattleQueue',
+              result: Tuple[str, int, List[int]]) -> None:
+        """
+        Store result, the best move, its score and the scores of every move,
+        for battle_queue, unless a Sorcerer in battle_queue doesn't use the
+        default SkillDecisionTree.
+        """
+        if not uses_default_trees(battle_queue):
+            return
+
+        with self._lock:
+            self._pending[cache_key(battle_queue)] = \
+                (repr(battle_queue.get_signature()), result)
+            self._flush_if_full()
+
+    def _flush_if_full(self) -> None:
+        """
+        Write the entries kept in memory to the file once there are
+        batch_size of them.
+        """
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the entries kept in memory, and when the entries of the file
+        that were looked up were last used, to the file and drop the least
+        recently used entries of the file beyond max_entries.
+
+        >>> import os, tempfile
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_characters import Rogue, Mage
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> bq = BattleQueue()
+        >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> r.enemy = m
+        >>> m.enemy = r
+        >>> bq.add(r)
+        >>> bq.add(m)
+        >>> path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite')
+        >>> cache = ResultCache(path, max_entries=1)
+        >>> cache.store(bq, ('A', 1, [1, 0]))
+        >>> r.set_hp(50)
+        >>> cache.store(bq, ('S', 2, [0, 2]))
+        >>> cache.flush()
+        >>> len(cache)
+        1
+        >>> cache.lookup(bq)
+        ('S', 2, [0, 2])
+
+        Looking an entry up only marks it as used:
+
+        >>> cache.max_entries = 2
+        >>> m.set_hp(50)
+        >>> cache.store(bq, ('A', 3, [3, 0]))
+        >>> cache.flush()
+        >>> r.set_hp(50)
+        >>> m.set_hp(100)
+        >>> cache.lookup(bq)
+        ('S', 2, [0, 2])
+        >>> cache._pending
+        {}
+        >>> r.set_hp(60)
+        >>> cache.store(bq, ('A', 4, [4, 0]))
+        >>> cache.flush()
+        >>> r.set_hp(50)
+        >>> cache.lookup(bq)
+        ('S', 2, [0, 2])
+        >>> m.set_hp(50)
+        >>> cache.lookup(bq) is None
+        True
+        >>> cache.close()
+        """
+        with self._lock:
+            rows = []
+
+            for (key, restricted), (signature, (action, score, scores)) in \
+                    self._pending.items():
+                self._clock += 1
+                rows.append((key, restricted, signature, action, score,
+                             ','.join(str(s) for s in scores), self._clock))
+
+            self._pending.clear()
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO results VALUES "
+                "(?, ?, ?, ?, ?, ?, ?)", rows)
+            self._connection.executemany(
+                "UPDATE results SET used = ? WHERE hash = ? AND "
+                "restricted = ?",
+                [(used, key, restricted)
+                 for (key, restricted), used in self._used.items()])
+            self._used.clear()
+
+            extra = len(self) - self.max_entries
+
+            if extra > 0:
+                self._connection.execute(
+                    "DELETE FROM results WHERE rowid IN (SELECT rowid FROM "
+                    "results ORDER BY used LIMIT ?)", (extra,))
+
+            self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Write the entries kept in memory to the file and close it.
+        """
+        with self._lock:
+            self.flush()
+            self._connection.close()
+
+    def __len__(self) -> int:
+        """
+        Return the number of entries in this ResultCache's file, not
+        counting those still kept in memory.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def open_result_cache(path: str = DEFAULT_PATH,
+                      max_entries: int = DEFAULT_MAX_ENTRIES,
+                      batch_size: int = DEFAULT_BATCH_SIZE) \
+        -> Union[ResultCache, None]:
+    """
+    Return a ResultCache kept in the file at path, or None if that file
+    can't be opened as one.
+    """
+    try:
+        return ResultCache(path, max_entries, batch_size)
+    except (OSError, sqlite3.Error):
+        return None
@@ -0,0 +1,291 @@
+"""
+Shared building blocks for the minimax searches in a2_playstyle.
+"""
+from typing import Any, Hashable
+from collections import OrderedDict
+
+DEFAULT_TABLE_SIZE = 500000
+
+
+class TranspositionTable:
+    """
+    A bounded cache of solved subtree scores, keyed by game state.
+
+    Many different move orders reach the same HP/SP/queue state, so the
+    game tree is really a DAG. A TranspositionTable lets a search solve each
+    of those states once. When the table is full, the least recently used
+    entry is evicted.
+
+    max_size - the maximum number of entries kept in this table.
+    hits - the number of lookups that found an entry.
+    misses - the number of lookups that did not find an entry.
+    """
+    max_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int = DEFAULT_TABLE_SIZE) -> None:
+        """
+        Initialize this TranspositionTable so that it holds at most max_size
+        entries.
+
+        >>> t = TranspositionTable(10)
+        >>> len(t)
+        0
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._content = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the value stored for key, or None if there isn't one.
+
+        >>> t = TranspositionTable(10)
+        >>> t.put('a', 5)
+        >>> t.get('a')
+        5
+        >>> t.get('b') is None
+        True
+        >>> (t.hits, t.misses)
+        (1, 1)
+        """
+        value = self._content.get(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._content.move_to_end(key)
+
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store value for key, evicting the least recently used entry if this
+        table is full.
+
+        >>> t = TranspositionTable(2)
+        >>> t.put('a', 1)
+        >>> t.put('b', 2)
+        >>> t.get('a')
+        1
+        >>> t.put('c', 3)
+        >>> t.get('b') is None
+        True
+        >>> len(t)
+        2
+        """
+        self._content[key] = value
+        self._content.move_to_end(key)
+
+        while len(self._content) > self.max_size:
+            self._content.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove every entry from this TranspositionTable.
+
+        >>> t = TranspositionTable(2)
+        >>> t.put('a', 1)
+        >>> t.clear()
+        >>> len(t)
+        0
+        """
+        self._content.clear()
+
+    def __len__(self) -> int:
+        """
+        Return the number of entries in this TranspositionTable.
+        """
+        return len(self._content)
+
+
+def table_key(battle_queue: 'BattleQueue', first_player: str) -> tuple:
+    """
+    Return the key under which the score of battle_queue, as seen by the
+    player named first_player, is stored in a TranspositionTable.
+
+    The key uses BattleQueue.get_signature(), not get_hash(): two games
+    with the same hash would share an entry, and a lookup can't tell that
+    the score it found belongs to another game.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> m = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = m
+    >>> m.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(m)
+    >>> table_key(bq, "m")
+    ((('rogue', 100, 100), ('mage', 100, 100), (0, 1)), False, True)
+    >>> table_key(bq, "m") == table_key(bq.copy(), "m")
+    True
+    """
+    signature = battle_queue.get_signature()
+
+    if not signature:
+        return signature, False, False
+
+    p1, p2 = battle_queue.get_players()
+    # Names are compared rather than characters, the same way the scores
+    # are, so two players with the same name are scored identically here.
+    return (signature, p1.get_name() == first_player,
+            p2.get_name() == first_player)
+
+
+def terminal_score(battle_queue: 'BattleQueue', first_player: str) -> int:
+    """
+    Return the score of the finished game in battle_queue for the player
+    named first_player: the winner's HP if first_player won, -1 * the
+    winner's HP if first_player lost and 0 for a tie.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> m = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = m
+    >>> m.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(m)
+    >>> r.set_hp(40)
+    >>> m.set_hp(0)
+    >>> terminal_score(bq, "r")
+    40
+    >>> terminal_score(bq, "m")
+    -40
+    """
+    winner = battle_queue.get_winner()
+
+    if not winner:
+        return 0
+    elif winner.get_name() == first_player:
+        return winner.get_hp()
+
+    return winner.get_hp() * -1
+
+
+def score_upper_bound(battle_queue: 'BattleQueue', first_player: str) -> int:
+    """
+    Return a score that no game continuing from battle_queue can beat for
+    the player named first_player.
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Vampire
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> v = Vampire("v", bq, ManualPlaystyle(bq))
+    >>> r.enemy = v
+    >>> v.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(v)
+    >>> r.set_hp(40)
+    >>> score_upper_bound(bq, "r")
+    40
+    >>> score_upper_bound(bq, "v")
+    140
+    """
+    bound = 0
+
+    for character in battle_queue.get_players():
+        if character.get_name() == first_player:
+            bound = max(bound, character.get_hp_bound())
+
+    return bound
+
+
+def make_move(battle_queue: 'BattleQueue', action: str) -> tuple:
+    """
+    Make the next character in battle_queue perform action, changing
+    battle_queue in place the same way a copy of it would change in
+    producer(). Return an undo entry for unmake_move().
+
+    >>> from a2_battle_queue import BattleQueue
+    >>> from a2_characters import Rogue, Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("r", bq, ManualPlaystyle(bq))
+    >>> m = Mage("m", bq, ManualPlaystyle(bq))
+    >>> r.enemy = m
+    >>> m.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(m)
+    >>> undo = make_move(bq, 'S')
+    >>> bq
+    m (Mage): 88/100 -> r (Rogue): 100/90 -> r (Rogue): 100/90
+    >>> unmake_move(bq, undo)
+    >>> bq
+    r (Rogue): 100/100 -> m (Mage): 100/100
+    """
+    p1, p2 = battle_queue.get_players()
+    undo = (p1.get_hp(), p1.get_sp(), p2.get_hp(), p2.get_sp(),
+            battle_queue.save())
+
+    battle_queue.rebuild()
+    character = battle_queue.peek()
+
+    if action == 'A':
+        character.attack()
+    elif action == 'S':
+        character.special_attack()
+
+    if not battle_queue.is_empty():
+        battle_queue.remove()
+
+    return undo
+
+
+def unmake_move(battle_queue: 'BattleQueue', undo: tuple) -> None:
+    """
+    Roll battle_queue back to how it was before the make_move() call that
+    returned undo.
+    """
+    p1, p2 = battle_queue.get_players()
+    p1_hp, p1_sp, p2_hp, p2_sp, snapshot = undo
+
+    p1.set_hp(p1_hp)
+    p1.set_sp(p1_sp)
+    p2.set_hp(p2_hp)
+    p2.set_sp(p2_sp)
+    battle_queue.restore(snapshot)
+
+
+def state_score(state: 'BattleState', player: int,
+                table: TranspositionTable = None) -> int:
+    """
+    Return the highest score player can reach from state, the same score
+    get_state_score() gives the matching BattleQueue. Solved states are
+    looked up in and stored in table, if given.
+
+    >>> from a2_battle_state import BattleState
+    >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3), (0, 1))
+    >>> state_score(s, 0)
+    7
+    >>> state_score(s, 1, TranspositionTable())
+    20
+    """
+    if state.is_over():
+        return state.get_score(player)
+
+    if table is not None:
+        key = (state, player)
+        score = table.get(key)
+
+        if score is not None:
+            return score
+
+    score = max(state_score(state.apply(action), player, table)
+                for action in state.get_available_actions())
+
+    if table is not None:
+        table.put(key, score)
+
+    return score
+
@@ -0,0 +1,322 @@
+"""
+Endgame tablebases: the score of every state reachable from the start of a
+game, solved ahead of time.
+
+A game starts with both characters at 100 HP and 100 SP, so each class pair
+and queue type only reaches a few thousand states. build_tablebase() finds
+all of them and solves them backwards, from the states with the least SP
+left (every move costs SP, so their children are already solved) up to the
+start of the game. The scores are written to a binary file that a Tablebase
+memory-maps, so looking a state up doesn't need to read the whole file.
+
+The file starts with a header (MAGIC, FORMAT_VERSION, the number of
+slots and the rules_fingerprint() of the rules it was solved with),
+followed by a hash table of slots. A file solved with other rules isn't
+opened, so a tablebase built before a skill, defense or SkillDecisionTree
+change has to be built again. Each slot holds the 64-bit hash
+of a state, 0 for an empty slot, and the scores of that state for player 0
+and player 1.
+
+Run this module to build the tablebase:
+
+    python a2_tablebase.py [path]
+"""
+from typing import Dict, List, Tuple, Union
+import hashlib
+import mmap
+import struct
+import sys
+from a2_battle_state import BattleState, CHARACTER_CLASSES, to_battle_state, \
+    rules_fingerprint, uses_default_trees
+
+DEFAULT_PATH = 'a2_tablebase.bin'
+MAGIC = b'A2TB'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sIQ16s')
+SLOT = struct.Struct('<Qhh')
+START_HP = 100
+START_SP = 100
+
+
+def start_state(restricted: bool, classes: Tuple[str, str]) -> BattleState:
+    """
+    Return the BattleState at the start of a game between characters of
+    type classes, as set up by a2_game.
+
+    >>> start_state(False, ('mage', 'rogue'))
+    BattleState(restricted=False, classes=('mage', 'rogue'), \
+hp=(100, 100), sp=(100, 100), queue=(0, 1), flags=())
+    """
+    flags = ((0, 0), (1, 0)) if restricted else ()
+    return BattleState(restricted, classes, (START_HP, START_HP),
+                       (START_SP, START_SP), (0, 1), flags)
+
+
+def reachable_states(start: BattleState) -> List[BattleState]:
+    """
+    Return every state that isn't over and can be reached from start,
+    including start, so that every state comes after its children.
+
+    A BattleQueue drops the players at the front of its queue who can't act
+    whenever it is peeked at, and for a RestrictedBattleQueue that changes
+    who can add later on, so the clean() version of every state is reached
+    too.
+
+    >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3), (0, 1))
+    >>> reachable_states(s)[-1] == s
+    True
+    """
+    seen = {start}
+    to_visit = [start]
+    states = []
+
+    while to_visit:
+        state = to_visit.pop()
+
+        if not state.is_over():
+            states.append(state)
+
+            children = [state.apply(action)
+                        for action in state.get_available_actions()]
+
+            for child in children + [state.clean()]:
+                if child not in seen:
+                    seen.add(child)
+                    to_visit.append(child)
+
+    # Every move costs SP, so a state's children always have less SP left.
+    states.sort(key=lambda s: sum(s.sp))
+    return states
+
+
+def solve(start: BattleState) -> Dict[BattleState, Tuple[int, int]]:
+    """
+    Return the scores for player 0 and player 1 of every state that isn't
+    over and can be reached from start, the same scores get_state_score()
+    in a2_playstyle gives.
+
+    >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3), (0, 1))
+    >>> solve(s)[s]
+    (7, 20)
+    """
+    scores = {}
+
+    for state in reachable_states(start):
+        best = [None, None]
+
+        for action in state.get_available_actions():
+            child = state.apply(action)
+
+            if child.is_over():
+                child_scores = (child.get_score(0), child.get_score(1))
+            else:
+                child_scores = scores[child]
+
+            for player in range(2):
+                if best[player] is None or child_scores[player] > best[player]:
+                    best[player] = child_scores[player]
+
+        scores[state] = (best[0], best[1])
+
+    return scores
+
+
+def state_hash(state: BattleState) -> int:
+    """
+    Return the 64-bit hash a state is stored under in a tablebase file. It
+    is never 0, and unlike hash() it is the same in every process.
+    """
+    digest = hashlib.blake2b(repr(tuple(state)).encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), 'little') or 1
+
+
+def write_tablebase(path: str,
+                    scores: Dict[BattleState, Tuple[int, int]]) -> None:
+    """
+    Write scores to a new tablebase file at path.
+    """
+    slots = 1
+    while slots < 2 * len(scores):
+        slots *= 2
+
+    table = bytearray(SLOT.size * slots)
+
+    for state, (score0, score1) in scores.items():
+        key = state_hash(state)
+        slot = key % slots
+
+        while SLOT.unpack_from(table, slot * SLOT.size)[0] != 0:
+            slot = (slot + 1) % slots
+
+        SLOT.pack_into(table, slot * SLOT.size, key, score0, score1)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, slots,
+                               rules_fingerprint().encode()))
+        file.write(table)
+
+
+def build_tablebase(path: str = DEFAULT_PATH,
+                    matchups: List[Tuple[bool, Tuple[str, str]]] = None) \
+        -> int:
+    """
+    Solve every matchup, a (restricted, classes) pair, and write the scores
+    to a tablebase file at path. Every class pair with both queue types is
+    solved if matchups is None. Return the number of states written.
+    """
+    if matchups is None:
+        matchups = [(restricted, (class1, class2))
+                    for restricted in [False, True]
+                    for class1 in CHARACTER_CLASSES
+                    for class2 in CHARACTER_CLASSES]
+
+    scores = {}
+
+    for restricted, classes in matchups:
+        scores.update(solve(start_state(restricted, classes)))
+
+    write_tablebase(path, scores)
+    return len(scores)
+
+
+class Tablebase:
+    """
+    A memory-mapped tablebase file.
+
+    path - the file this Tablebase reads from.
+    slots - the number of slots in its hash table.
+    """
+    path: str
+    slots: int
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        """
+        Initialize this Tablebase from the tablebase file at path.
+
+        Raise a ValueError if path isn't a tablebase file of FORMAT_VERSION
+        solved with the current rules.
+
+        >>> import os, tempfile
+        >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                 (0, 1))
+        >>> path = os.path.join(tempfile.mkdtemp(), 'tb.bin')
+        >>> write_tablebase(path, solve(s))
+        >>> with open(path, 'r+b') as file:
+        ...     _ = file.seek(HEADER.size - 16)
+        ...     _ = file.write(b'0' * 16)
+        >>> Tablebase(path)  # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+        ...
+        ValueError: '...' was solved with other rules
+        """
+        self.path = path
+
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError("'{}' is not a tablebase file".format(path))
+
+        magic, version, self.slots, fingerprint = HEADER.unpack_from(
+            self._map, 0)
+
+        if magic != MAGIC or version != FORMAT_VERSION or \
+                len(self._map) != HEADER.size + self.slots * SLOT.size:
+            self._map.close()
+            raise ValueError("'{}' is not a version {} tablebase file".format(
+                path, FORMAT_VERSION))
+        if fingerprint != rules_fingerprint().encode():
+            self._map.close()
+            raise ValueError("'{}' was solved with other rules".format(path))
+
+    def lookup(self, state: BattleState, player: int) -> Union[int, None]:
+        """
+        Return the score of state for player, or None if it isn't in this
+        Tablebase.
+
+        >>> import os, tempfile
+        >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                 (0, 1))
+        >>> path = os.path.join(tempfile.mkdtemp(), 'tb.bin')
+        >>> write_tablebase(path, solve(s))
+        >>> tablebase = Tablebase(path)
+        >>> tablebase.lookup(s, 1)
+        20
+        >>> tablebase.lookup(s.apply('A'), 1)
+        20
+        >>> tablebase.lookup(start_state(False, ('mage', 'rogue')), 0) is None
+        True
+        >>> tablebase.close()
+        """
+        if state.is_over():
+            return state.get_score(player)
+
+        key = state_hash(state)
+        slot = key % self.slots
+
+        while True:
+            found, score0, score1 = SLOT.unpack_from(
+                self._map, HEADER.size + slot * SLOT.size)
+
+            if found == key:
+                return score1 if player else score0
+            elif found == 0:
+                return None
+
+            slot = (slot + 1) % self.slots
+
+    def close(self) -> None:
+        """
+        Close the file of this Tablebase.
+        """
+        self._map.close()
+
+
+def open_tablebase(path: str = DEFAULT_PATH) -> Union[Tablebase, None]:
+    """
+    Return the Tablebase in the file at path, or None if there is no
+    tablebase file there or it was solved with other rules.
+    """
+    try:
+        return Tablebase(path)
+    except (OSError, ValueError):
+        return None
+
+
+def tablebase_scores(battle_queue: 'BattleQueue', first_player: str,
+                     tablebase: Tablebase) -> Union[List[int], None]:
+    """
+    Return the scores of each move for the next player in battle_queue, as
+    producer() in a2_playstyle would, or None if tablebase doesn't have
+    all of them or a Sorcerer doesn't use the default SkillDecisionTree
+    the tablebase was solved with.
+    """
+    if not uses_default_trees(battle_queue):
+        return None
+
+    p1, p2 = battle_queue.get_players()
+
+    # The tablebase scores player 0 and player 1, so it can't tell apart
+    # two players with the same name.
+    if p1.get_name() == p2.get_name():
+        return None
+
+    player = 0 if p1.get_name() == first_player else 1
+    state = to_battle_state(battle_queue)
+    scores = []
+
+    for action in state.get_available_actions():
+        score = tablebase.lookup(state.apply(action), player)
+
+        if score is None:
+            return None
+
+        scores.append(score)
+
+    return scores
+
+
+if __name__ == '__main__':
+    PATH = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    print("Wrote {} states to {}".format(build_tablebase(PATH), PATH))
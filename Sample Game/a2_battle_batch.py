@@ -0,0 +1,304 @@
+"""
+Many BattleStates at once, stored as NumPy arrays so that a move can be
+played in every one of them with a few array operations.
+
+A BattleBatch has one row per game. The skills, costs and defenses of each
+class are turned into tables indexed by class and skill ids, so
+BattleBatch.apply() only has to look them up for every row at once. A
+Sorcerer's attack asks the default SkillDecisionTree for the skills of all
+its rows at once.
+
+Only games on a plain BattleQueue fit in a BattleBatch: the rules of a
+RestrictedBattleQueue depend on the order entries were added in.
+
+This module needs NumPy.
+"""
+from typing import List, NamedTuple, Sequence, Union
+import numpy as np
+from a2_battle_state import BattleState, CHARACTER_CLASSES, DEFENSE, \
+    SKILLS, SORCERER_ATTACK_COST, QUEUE_EFFECTS, CLEARS_QUEUE
+from a2_skill_decision_tree import DEFAULT_COMPILED_TREE
+
+CLASS_NAMES = list(CHARACTER_CLASSES)
+SKILL_TYPES = list(QUEUE_EFFECTS)
+ACTIONS = ['A', 'S']
+
+# Who a skill adds to the queue, in the SKILL_EFFECTS table.
+CASTER = 0
+TARGET = 1
+NOBODY = -1
+# The skill id of an action whose skill is picked by a SkillDecisionTree.
+TREE_SKILL = -1
+# A free spot in the queue of a row.
+EMPTY = -1
+
+DEFENSE_TABLE = np.array([DEFENSE[name] for name in CLASS_NAMES])
+SKILL_DAMAGE = np.array([skill().get_damage() for skill in SKILL_TYPES])
+SKILL_CLEARS = np.array([issubclass(skill, CLEARS_QUEUE)
+                         for skill in SKILL_TYPES])
+EFFECT_WIDTH = max(len(effect) for effect in QUEUE_EFFECTS.values())
+SKILL_EFFECTS = np.array([[CASTER if who == 'c' else TARGET
+                           for who in QUEUE_EFFECTS[skill]] +
+                          [NOBODY] * (EFFECT_WIDTH - len(QUEUE_EFFECTS[skill]))
+                          for skill in SKILL_TYPES])
+ACTION_SKILL = np.array([[SKILL_TYPES.index(type(SKILLS[name][action]))
+                          if action in SKILLS[name] else TREE_SKILL
+                          for action in ACTIONS]
+                         for name in CLASS_NAMES])
+ACTION_COST = np.array([[SKILLS[name][action].get_sp_cost()
+                         if action in SKILLS[name] else SORCERER_ATTACK_COST
+                         for action in ACTIONS]
+                        for name in CLASS_NAMES])
+VAMPIRE = CLASS_NAMES.index('vampire')
+
+
+class BattleBatch(NamedTuple):
+    """
+    A batch of games on a BattleQueue, one per row.
+
+    classes - the class id (an index in CLASS_NAMES) of player 0 and
+              player 1.
+    hp - the HP of player 0 and player 1.
+    sp - the SP of player 0 and player 1.
+    queue - the players in the queue, front first, followed by EMPTY.
+    """
+    classes: np.ndarray
+    hp: np.ndarray
+    sp: np.ndarray
+    queue: np.ndarray
+
+    def can_act(self) -> np.ndarray:
+        """
+        Return whether player 0 and player 1 have any action available, in
+        every row.
+
+        >>> b = to_battle_batch([BattleState(False, ('mage', 'rogue'),
+        ...                                  (100, 100), (4, 3), (0, 1))])
+        >>> b.can_act().tolist()
+        [[False, True]]
+        """
+        return self.sp >= ACTION_COST[self.classes].min(axis=2)
+
+    def clean(self) -> 'BattleBatch':
+        """
+        Return this BattleBatch without the players at the front of each
+        queue who can't act, the way BattleQueue.peek() leaves a BattleQueue.
+
+        >>> b = to_battle_batch([BattleState(False, ('mage', 'rogue'),
+        ...                                  (100, 100), (4, 3), (0, 1, 0))])
+        >>> b.clean().queue.tolist()
+        [[1, 0, -1]]
+        """
+        acting = self._acting()
+        first = np.where(acting.any(axis=1), acting.argmax(axis=1),
+                         self.queue.shape[1])
+
+        return self._replace(queue=_shift(self.queue, first))
+
+    def peek(self) -> np.ndarray:
+        """
+        Return the next player to act in every row, or player 0 where
+        nobody is left.
+
+        >>> b = to_battle_batch([BattleState(False, ('mage', 'rogue'),
+        ...                                  (100, 100), (4, 3), (0, 1, 0))])
+        >>> b.peek().tolist()
+        [1]
+        """
+        front = self.clean().queue[:, 0]
+
+        return np.where(front == EMPTY, 0, front)
+
+    def is_over(self) -> np.ndarray:
+        """
+        Return whether the game in each row is over.
+
+        >>> b = to_battle_batch([
+        ...     BattleState(False, ('mage', 'rogue'), (100, 0), (20, 5),
+        ...                 (0, 1)),
+        ...     BattleState(False, ('mage', 'rogue'), (100, 100), (4, 3),
+        ...                 (0, 1)),
+        ...     BattleState(False, ('mage', 'rogue'), (100, 100), (4, 3),
+        ...                 (0, 0))])
+        >>> b.is_over().tolist()
+        [True, False, True]
+        """
+        return (self.hp == 0).any(axis=1) | ~self._acting().any(axis=1)
+
+    def get_scores(self, player: int) -> np.ndarray:
+        """
+        Return the score of the finished game in each row for player: the
+        winner's HP if player won, -1 * the winner's HP if player lost, 0
+        for a tie or a game that isn't over.
+
+        >>> b = to_battle_batch([
+        ...     BattleState(False, ('mage', 'rogue'), (40, 0), (20, 5),
+        ...                 (0, 1)),
+        ...     BattleState(False, ('mage', 'rogue'), (0, 30), (20, 5),
+        ...                 (0, 1)),
+        ...     BattleState(False, ('mage', 'rogue'), (40, 30), (4, 2),
+        ...                 (0, 1))])
+        >>> b.get_scores(0).tolist()
+        [40, -30, 0]
+        """
+        over = self.is_over()
+        scores = np.zeros(len(self.hp), dtype=self.hp.dtype)
+
+        for winner in range(2):
+            won = over & (self.hp[:, 1 - winner] == 0)
+            sign = 1 if winner == player else -1
+            scores[won] = sign * self.hp[won, winner]
+
+        return scores
+
+    def apply(self, actions: Union[str, Sequence[str]]) -> 'BattleBatch':
+        """
+        Return the BattleBatch after the next player in every row performs
+        actions (one per row, or the same one for every row), the same way
+        BattleState.apply() plays a move. Every game must not be over and
+        its next player must be able to perform its action.
+
+        >>> from itertools import product
+        >>> from a2_tablebase import reachable_states, start_state
+        >>> states = [state
+        ...           for class1, class2 in product(CLASS_NAMES, repeat=2)
+        ...           for state in reachable_states(
+        ...               start_state(False, (class1, class2)))]
+        >>> actions = [state.get_available_actions()[-1]
+        ...            for state in states]
+        >>> after = to_battle_batch(states).apply(actions).to_states()
+        >>> after == [state.apply(action)
+        ...           for state, action in zip(states, actions)]
+        True
+        """
+        battle = self.clean()
+        rows = np.arange(len(battle.hp))
+
+        if isinstance(actions, str):
+            action_ids = np.full(len(rows), ACTIONS.index(actions))
+        else:
+            action_ids = np.array([ACTIONS.index(action)
+                                   for action in actions], dtype=int)
+
+        caster = battle.queue[:, 0].astype(int)
+        target = 1 - caster
+        caster_class = battle.classes[rows, caster]
+        target_class = battle.classes[rows, target]
+        hp = battle.hp.copy()
+        sp = battle.sp.copy()
+        skill = ACTION_SKILL[caster_class, action_ids]
+        sp[rows, caster] -= ACTION_COST[caster_class, action_ids]
+
+        tree_rows = rows[skill == TREE_SKILL]
+        skill[tree_rows] = DEFAULT_COMPILED_TREE.pick_skill_ids(
+            hp[tree_rows, caster[tree_rows]],
+            battle.sp[tree_rows, caster[tree_rows]],
+            hp[tree_rows, target[tree_rows]],
+            battle.sp[tree_rows, target[tree_rows]], SKILL_TYPES)
+        sp[rows, caster] = np.maximum(sp[rows, caster], 0)
+
+        target_hp = hp[rows, target]
+        damage = SKILL_DAMAGE[skill] - DEFENSE_TABLE[target_class]
+        hp[rows, target] = np.maximum(target_hp - damage, 0)
+        healing = np.where(caster_class == VAMPIRE,
+                           target_hp - hp[rows, target], 0)
+        hp[rows, caster] += healing
+
+        queue = np.concatenate(
+            [battle.queue, np.full((len(rows), EFFECT_WIDTH), EMPTY,
+                                   dtype=battle.queue.dtype)], axis=1)
+        queue[SKILL_CLEARS[skill]] = EMPTY
+        length = (queue != EMPTY).sum(axis=1)
+
+        for effect in SKILL_EFFECTS[skill].T:
+            adding = effect != NOBODY
+            queue[rows[adding], length[adding]] = np.where(
+                effect == CASTER, caster, target)[adding]
+            length += adding
+
+        battle = BattleBatch(battle.classes, hp, sp, queue).clean()
+        acting = battle.queue[:, 0] != EMPTY
+
+        return battle._replace(queue=_trim(_shift(battle.queue, acting)))
+
+    def to_states(self) -> List[BattleState]:
+        """
+        Return the BattleState of the game in each row.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (7, 30), (30, 3),
+        ...                 (0, 1))
+        >>> to_battle_batch([s]).to_states() == [s]
+        True
+        """
+        return [BattleState(False,
+                            (CLASS_NAMES[classes[0]], CLASS_NAMES[classes[1]]),
+                            (int(hp[0]), int(hp[1])), (int(sp[0]), int(sp[1])),
+                            tuple(int(player) for player in queue
+                                  if player != EMPTY))
+                for classes, hp, sp, queue
+                in zip(self.classes, self.hp, self.sp, self.queue)]
+
+    def _acting(self) -> np.ndarray:
+        """
+        Return whether each entry of each queue is a player who can act.
+        """
+        rows = np.arange(len(self.hp))[:, None]
+        players = np.where(self.queue == EMPTY, 0, self.queue)
+
+        return (self.queue != EMPTY) & self.can_act()[rows, players]
+
+
+def to_battle_batch(states: Sequence[BattleState]) -> BattleBatch:
+    """
+    Return a BattleBatch with a row for each of states.
+
+    >>> b = to_battle_batch([BattleState(False, ('mage', 'rogue'), (7, 30),
+    ...                                  (30, 3), (0, 1))])
+    >>> b.classes.tolist(), b.hp.tolist(), b.queue.tolist()
+    ([[0, 1]], [[7, 30]], [[0, 1]])
+    >>> to_battle_batch([BattleState(True, ('mage', 'rogue'), (7, 30),
+    ...                              (30, 3), (0, 1), ((0, 0), (1, 0)))])
+    Traceback (most recent call last):
+    ...
+    ValueError: a BattleBatch can't hold games on a RestrictedBattleQueue
+    """
+    if any(state.restricted for state in states):
+        raise ValueError(
+            "a BattleBatch can't hold games on a RestrictedBattleQueue")
+
+    width = max([len(state.queue) for state in states] + [1])
+    queue = np.full((len(states), width), EMPTY, dtype=np.int8)
+
+    for row, state in enumerate(states):
+        queue[row, :len(state.queue)] = state.queue
+
+    return BattleBatch(
+        np.array([[CLASS_NAMES.index(name) for name in state.classes]
+                  for state in states], dtype=np.int8).reshape(-1, 2),
+        np.array([state.hp for state in states], dtype=np.int64).reshape(-1, 2),
+        np.array([state.sp for state in states], dtype=np.int64).reshape(-1, 2),
+        queue)
+
+
+def _shift(queue: np.ndarray, amount: np.ndarray) -> np.ndarray:
+    """
+    Return queue with the first amount entries of each row removed.
+    """
+    columns = np.arange(queue.shape[1]) + np.asarray(amount)[..., None]
+    inside = columns < queue.shape[1]
+    rows = np.arange(len(queue))[:, None]
+
+    return np.where(inside,
+                    queue[rows, np.minimum(columns, queue.shape[1] - 1)],
+                    EMPTY).astype(queue.dtype)
+
+
+def _trim(queue: np.ndarray) -> np.ndarray:
+    """
+    Return queue without the columns at its end that are EMPTY in every
+    row, keeping at least one column.
+    """
+    used = (queue != EMPTY).any(axis=0)
+    width = used.nonzero()[0].max() + 1 if used.any() else 1
+
+    return queue[:, :width]
@@ -1,5 +1,8 @@
 """ battle queue to keep track """
-from typing import Union
+from typing import Tuple, Union
+import a2_zobrist
+from a2_zobrist import sequence_hash, rotate, check_hash, MASK, BASE, \
+    BASE_INVERSE, ENTRY_KEYS, FLAG_KEYS
 
 class BattleQueue:
     """
@@ -17,6 +20,8 @@ class BattleQueue:
         self._content = []
         self._p1 = None
         self._p2 = None
+        self._hash = 0
+        self._power = 1
 
     def _clean_queue(self) -> None:
         """
@@ -36,7 +41,7 @@ class BattleQueue:
         False
         """
         while self._content and self._content[0].get_available_actions() == []:
-            self._content.pop(0)
+            self._pop_front()
 
     def add(self, character: 'Character') -> None:
         """
@@ -53,12 +58,13 @@ class BattleQueue:
         >>> bq.is_empty()
         False
         """
-        self._content.append(character)
-
         if not self._p1:
             self._p1 = character
             self._p2 = character.enemy
 
+        self._content.append(character)
+        self._push(character)
+
     def remove(self) -> 'Character':
         """
         Remove and return the character at the front of this BattleQueue.
@@ -78,7 +84,34 @@ class BattleQueue:
         """
         self._clean_queue()
 
-        return self._content.pop(0)
+        return self._pop_front()
+
+    def _entry_key(self, character: 'Character') -> int:
+        """
+        Return the key of an entry for character in this BattleQueue.
+        """
+        return ENTRY_KEYS[0] if character is self._p1 else ENTRY_KEYS[1]
+
+    def _push(self, character: 'Character') -> None:
+        """
+        Update the hash of this BattleQueue's order after character was
+        added to the back of it.
+        """
+        self._hash = (self._hash + self._entry_key(character) * self._power) \
+            & MASK
+        self._power = self._power * BASE & MASK
+
+    def _pop_front(self) -> 'Character':
+        """
+        Remove and return the character at the front of this BattleQueue,
+        updating the hash of its order.
+        """
+        character = self._content.pop(0)
+        self._hash = (self._hash - self._entry_key(character)) \
+            * BASE_INVERSE & MASK
+        self._power = self._power * BASE_INVERSE & MASK
+
+        return character
 
     def is_empty(self) -> bool:
         """
@@ -179,6 +212,151 @@ class BattleQueue:
 
         return None
 
+    def get_players(self) -> Tuple['Character', 'Character']:
+        """
+        Return the first and second player of the game being carried out in
+        this BattleQueue.
+
+        >>> bq = BattleQueue()
+        >>> from a2_characters import Rogue
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> c = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> c2 = Rogue("r2", bq, ManualPlaystyle(bq))
+        >>> c.enemy = c2
+        >>> c2.enemy = c
+        >>> bq.add(c2)
+        >>> bq.get_players()
+        (r2 (Rogue): 100/100, r (Rogue): 100/100)
+        """
+        return self._p1, self._p2
+
+    def get_signature(self) -> tuple:
+        """
+        Return a hashable summary of the game being carried out in this
+        BattleQueue: the class, HP and SP of the first and second player,
+        followed by the order of the queue (0 for the first player, 1 for
+        the second).
+
+        Two BattleQueues with the same signature lead to the same game.
+
+        >>> bq = BattleQueue()
+        >>> from a2_characters import Rogue, Mage
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> c = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> c2 = Mage("m", bq, ManualPlaystyle(bq))
+        >>> c.enemy = c2
+        >>> c2.enemy = c
+        >>> bq.add(c)
+        >>> bq.add(c2)
+        >>> c.attack()
+        >>> bq.get_signature()
+        (('rogue', 100, 97), ('mage', 93, 100), (0, 1, 0))
+        """
+        if not self._p1:
+            return ()
+
+        return (self._p1.get_signature(), self._p2.get_signature(),
+                tuple(0 if character is self._p1 else 1
+                      for character in self._content))
+
+    def get_hash(self) -> int:
+        """
+        Return a 64-bit hash of the game being carried out in this
+        BattleQueue. BattleQueues with the same signature have the same hash.
+
+        The hash is kept up to date as characters are added and removed and
+        as their HP and SP change, so this takes the same time however long
+        this BattleQueue is.
+
+        >>> bq = BattleQueue()
+        >>> from a2_characters import Rogue, Mage
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> c = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> c2 = Mage("m", bq, ManualPlaystyle(bq))
+        >>> c.enemy = c2
+        >>> c2.enemy = c
+        >>> bq.add(c)
+        >>> bq.add(c2)
+        >>> c.attack()
+        >>> other = bq.copy()
+        >>> other.get_hash() == bq.get_hash()
+        True
+        >>> other.remove()
+        r (Rogue): 100/97
+        >>> other.get_hash() == bq.get_hash()
+        False
+        """
+        if not self._p1:
+            return 0
+
+        if a2_zobrist.VERIFY_HASHES:
+            return check_hash(self._incremental_hash(),
+                              self._hash_from_scratch())
+
+        return self._incremental_hash()
+
+    def _incremental_hash(self) -> int:
+        """
+        Return the hash of this BattleQueue from the hashes kept up to date.
+        """
+        return self._p1.get_hash() ^ rotate(self._p2.get_hash()) ^ self._hash
+
+    def _hash_from_scratch(self) -> int:
+        """
+        Return the hash of this BattleQueue, going through all of it.
+        """
+        return self._p1.get_hash() ^ rotate(self._p2.get_hash()) ^ \
+            sequence_hash([self._entry_key(character)
+                           for character in self._content])
+
+    def _rehash(self) -> None:
+        """
+        Work out the hash of this BattleQueue's order from scratch.
+        """
+        self._hash = sequence_hash([self._entry_key(character)
+                                    for character in self._content])
+        self._power = pow(BASE, len(self._content), MASK + 1)
+
+    def save(self) -> list:
+        """
+        Return a snapshot of the order of this BattleQueue that restore() can
+        roll back to.
+
+        >>> bq = BattleQueue()
+        >>> from a2_characters import Rogue
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> c = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> c2 = Rogue("r2", bq, ManualPlaystyle(bq))
+        >>> c.enemy = c2
+        >>> c2.enemy = c
+        >>> bq.add(c)
+        >>> bq.add(c2)
+        >>> snapshot = bq.save()
+        >>> bq.remove()
+        r (Rogue): 100/100
+        >>> bq.restore(snapshot)
+        >>> bq
+        r (Rogue): 100/100 -> r2 (Rogue): 100/100
+        """
+        return self._content[:]
+
+    def restore(self, snapshot: list) -> None:
+        """
+        Roll the order of this BattleQueue back to snapshot, which was
+        returned by save().
+        """
+        self._content = snapshot[:]
+        self._rehash()
+
+    def rebuild(self) -> None:
+        """
+        Re-add the characters in this BattleQueue the same way copy() adds
+        them to the copy, without copying any characters.
+
+        A copy of a BattleQueue has the same order as the original, so there
+        is nothing to do here.
+        """
+
     def copy(self) -> 'BattleQueue':
         """
         Return a copy of this BattleQueue. The copy contains copies of the
@@ -286,6 +464,8 @@ class RestrictedBattleQueue(BattleQueue):
 
         super().__init__()
         self.real = []
+        self._flag_hash = 0
+        self._flag_power = 1
 
     def add(self, character: 'Character') -> None:
 
@@ -310,7 +490,9 @@ class RestrictedBattleQueue(BattleQueue):
 
 
             self.real += [[character, 0]]
+            self._push_flag(character, 0)
             self._content.append(character)
+            self._push(character)
 
 
         elif self.real == [] or self.real[0][1] == 0:
@@ -323,9 +505,138 @@ class RestrictedBattleQueue(BattleQueue):
                     x = 1
 
             self.real += [[character, x]]
+            self._push_flag(character, x)
             self._content.append(character)
+            self._push(character)
             #print(self.real.count([character, 0]))
 
+    def get_signature(self) -> tuple:
+        """
+        Return a hashable summary of the game being carried out in this
+        RestrictedBattleQueue. On top of BattleQueue's signature, this
+        records which entries are able to add.
+
+        >>> bq = RestrictedBattleQueue()
+        >>> from a2_characters import Rogue
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> c = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> c2 = Rogue("r2", bq, ManualPlaystyle(bq))
+        >>> c.enemy = c2
+        >>> c2.enemy = c
+        >>> bq.add(c)
+        >>> bq.add(c2)
+        >>> bq.add(c2)
+        >>> bq.get_signature()[2:]
+        ((0, 1, 1), ((0, 0), (1, 0), (1, 1)))
+        """
+        if not self._p1:
+            return ()
+
+        return super().get_signature() + \
+            (tuple((0 if character is self._p1 else 1, flag)
+                   for character, flag in self.real),)
+
+    def _flag_key(self, character: 'Character', flag: int) -> int:
+        """
+        Return the key of an entry for character with flag flag in real.
+        """
+        return FLAG_KEYS[(0 if character is self._p1 else 2) + flag]
+
+    def _push_flag(self, character: 'Character', flag: int) -> None:
+        """
+        Update the hash of real after character was added to the back of it
+        with flag flag.
+        """
+        key = FLAG_KEYS[(0 if character is self._p1 else 2) + flag]
+        self._flag_hash = (self._flag_hash + key * self._flag_power) & MASK
+        self._flag_power = self._flag_power * BASE & MASK
+
+    def _pop_flag(self) -> None:
+        """
+        Remove the entry at the front of real, updating its hash.
+        """
+        character, flag = self.real.pop(0)
+        self._flag_hash = (self._flag_hash - self._flag_key(character, flag)) \
+            * BASE_INVERSE & MASK
+        self._flag_power = self._flag_power * BASE_INVERSE & MASK
+
+    def _incremental_hash(self) -> int:
+        """
+        Return the hash of this RestrictedBattleQueue from the hashes kept up
+        to date.
+        """
+        return super()._incremental_hash() ^ self._flag_hash
+
+    def _hash_from_scratch(self) -> int:
+        """
+        Return the hash of this RestrictedBattleQueue, going through all of
+        it.
+        """
+        return super()._hash_from_scratch() ^ \
+            sequence_hash([self._flag_key(character, flag)
+                           for character, flag in self.real])
+
+    def _rehash(self) -> None:
+        """
+        Work out the hashes of this RestrictedBattleQueue's order and of
+        real from scratch.
+        """
+        super()._rehash()
+        self._flag_hash = sequence_hash([self._flag_key(character, flag)
+                                         for character, flag in self.real])
+        self._flag_power = pow(BASE, len(self.real), MASK + 1)
+
+    def save(self) -> tuple:
+        """
+        Return a snapshot of the order of this RestrictedBattleQueue, and of
+        which entries are able to add, that restore() can roll back to.
+        """
+        return self._content[:], self.real[:]
+
+    def restore(self, snapshot: tuple) -> None:
+        """
+        Roll this RestrictedBattleQueue back to snapshot, which was returned
+        by save().
+        """
+        self._content = snapshot[0][:]
+        self.real = snapshot[1][:]
+        self._rehash()
+
+    def rebuild(self) -> None:
+        """
+        Re-add the characters in this RestrictedBattleQueue the same way
+        copy() adds them to the copy, without copying any characters. This
+        works out again which entries are able to add.
+
+        >>> bq = RestrictedBattleQueue()
+        >>> from a2_characters import Rogue
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> c = Rogue("r", bq, ManualPlaystyle(bq))
+        >>> c2 = Rogue("r2", bq, ManualPlaystyle(bq))
+        >>> c.enemy = c2
+        >>> c2.enemy = c
+        >>> bq.add(c)
+        >>> bq.add(c)
+        >>> bq.add(c2)
+        >>> bq.remove()
+        r (Rogue): 100/100
+        >>> bq.copy().get_signature() == bq.get_signature()
+        False
+        >>> bq.rebuild()
+        >>> bq.copy().get_signature() == bq.get_signature()
+        True
+        """
+        p1 = self._p1
+        content = self._content
+
+        self.__init__()
+        self.add(p1)
+        if not self.is_empty():
+            self.remove()
+
+        for character in content:
+            self.add(character)
+
     def copy(self) -> 'BattleQueue':
         """
         Return a copy of this BattleQueue. The copy contains copies of the
@@ -386,8 +697,8 @@ class RestrictedBattleQueue(BattleQueue):
         True
         """
         if self.real != []:
-            self.real.pop(0)
+            self._pop_flag()
 
         self._clean_queue()
 
-        return self._content.pop(0)
+        return self._pop_front()
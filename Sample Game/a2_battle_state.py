@@ -0,0 +1,635 @@
+"""
+A compact, immutable representation of a game for searches.
+
+A BattleState holds only what the game logic needs: each player's class,
+HP and SP, the order of the queue and, for a RestrictedBattleQueue, which
+entries are able to add. Unlike a BattleQueue, it is hashable, picklable and
+cheap to compare, and BattleState.apply() plays a move without changing it.
+
+Player 0 is the first player of the BattleQueue and player 1 the second.
+Sorcerers are assumed to use the default SkillDecisionTree, so a game with
+a Sorcerer using any other tree has no BattleState (see
+uses_default_trees()).
+"""
+from typing import Any, Callable, List, NamedTuple, Tuple, Union
+import hashlib
+from a2_battle_queue import BattleQueue, RestrictedBattleQueue
+from a2_characters import Mage, Rogue, Vampire, Sorcerer
+from a2_skills import MAGE_ATTACK, MAGE_SPECIAL, ROGUE_ATTACK, \
+    ROGUE_SPECIAL, VAMPIRE_ATTACK, VAMPIRE_SPECIAL, SORCERER_SPECIAL, \
+    sorcerer_attack
+from a2_skill_decision_tree import DEFAULT_TREE, DEFAULT_COMPILED_TREE, \
+    StatComparison, Always
+
+CHARACTER_CLASSES = {'mage': Mage,
+                     'rogue': Rogue,
+                     'vampire': Vampire,
+                     'sorcerer': Sorcerer
+                    }
+
+DEFENSE = {name: character_class._defense
+           for name, character_class in CHARACTER_CLASSES.items()}
+
+SKILLS = {'mage': {'A': MAGE_ATTACK, 'S': MAGE_SPECIAL},
+          'rogue': {'A': ROGUE_ATTACK, 'S': ROGUE_SPECIAL},
+          'vampire': {'A': VAMPIRE_ATTACK, 'S': VAMPIRE_SPECIAL},
+          'sorcerer': {'S': SORCERER_SPECIAL}
+         }
+
+SORCERER_ATTACK_COST = sorcerer_attack(MAGE_ATTACK).get_sp_cost()
+
+
+class _QueueRecorder:
+    """
+    A stand-in for the BattleQueue, and the caster and target, of a skill
+    being used, that records what the skill does to the queue.
+
+    added - who the skill added to the queue, in order: 'c' for the caster
+            and 't' for the target.
+    cleared - whether the skill removed what was in the queue.
+    """
+    added: str
+    cleared: bool
+
+    def __init__(self) -> None:
+        """
+        Initialize this _QueueRecorder, with something in the queue.
+        """
+        self.added = ''
+        self.cleared = False
+        self.battle_queue = self
+        self.caster = _StandIn('c', self)
+        self.target = _StandIn('t', self)
+
+    def add(self, character: '_StandIn') -> None:
+        """
+        Record that character was added to the queue.
+        """
+        self.added += character.role
+
+    def is_empty(self) -> bool:
+        """
+        Return whether the queue is empty, which it is once it was cleared.
+        """
+        return self.cleared
+
+    def remove(self) -> None:
+        """
+        Record that the queue was cleared.
+        """
+        self.cleared = True
+
+
+class _StandIn:
+    """
+    The caster or the target of a skill being used by a _QueueRecorder.
+    """
+
+    def __init__(self, role: str, recorder: _QueueRecorder) -> None:
+        """
+        Initialize this _StandIn, the caster if role is 'c' or the target
+        if it is 't', whose BattleQueue is recorder.
+        """
+        self.role = role
+        self.battle_queue = recorder
+
+    def reduce_sp(self, _: int) -> None:
+        """
+        Ignore the SP the skill costs.
+        """
+
+    def apply_damage(self, _: int) -> None:
+        """
+        Ignore the damage the skill deals.
+        """
+
+
+def queue_effect(skill: 'Skill') -> Tuple[str, bool]:
+    """
+    Return who skill adds to the queue when used, in order, where 'c' is
+    the caster and 't' the target, and whether it empties the queue first.
+
+    >>> queue_effect(MAGE_SPECIAL)
+    ('tc', False)
+    >>> queue_effect(SORCERER_SPECIAL)
+    ('ctc', True)
+    """
+    recorder = _QueueRecorder()
+    skill.use(recorder.caster, recorder.target)
+
+    return recorder.added, recorder.cleared
+
+
+_ALL_SKILLS = (MAGE_ATTACK, MAGE_SPECIAL, ROGUE_ATTACK, ROGUE_SPECIAL,
+               VAMPIRE_ATTACK, VAMPIRE_SPECIAL, SORCERER_SPECIAL)
+
+# Who each type of skill adds to the queue, in order, where 'c' is the
+# caster and 't' the target, worked out by using it.
+QUEUE_EFFECTS = {type(skill): queue_effect(skill)[0] for skill in _ALL_SKILLS}
+
+# The types of skills that empty the queue before adding to it.
+CLEARS_QUEUE = tuple(type(skill) for skill in _ALL_SKILLS
+                     if queue_effect(skill)[1])
+
+
+class BattleState(NamedTuple):
+    """
+    An immutable snapshot of a game.
+
+    restricted - whether the game uses a RestrictedBattleQueue.
+    classes - the character type of player 0 and player 1.
+    hp - the HP of player 0 and player 1.
+    sp - the SP of player 0 and player 1.
+    queue - the players in the queue, front first.
+    flags - for a RestrictedBattleQueue, a (player, unable to add) pair for
+            each entry it keeps track of. Empty otherwise.
+    """
+    restricted: bool
+    classes: Tuple[str, str]
+    hp: Tuple[int, int]
+    sp: Tuple[int, int]
+    queue: Tuple[int, ...]
+    flags: Tuple[Tuple[int, int], ...] = ()
+
+    def get_available_actions(self, player: int = None) -> List[str]:
+        """
+        Return the actions player can perform, or those of the next player
+        if player is None.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (100, 100), (20, 5),
+        ...                 (0, 1))
+        >>> s.get_available_actions()
+        ['A']
+        >>> s.get_available_actions(1)
+        ['A']
+        """
+        if player is None:
+            player = self.peek()
+
+        return _available_actions(self.classes[player], self.sp[player])
+
+    def peek(self) -> int:
+        """
+        Return the next player to act, skipping the players at the front of
+        the queue who can't act. Return player 0 if nobody is left.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (100, 100), (0, 5),
+        ...                 (0, 1))
+        >>> s.peek()
+        1
+        """
+        for player in self.queue:
+            if _available_actions(self.classes[player], self.sp[player]):
+                return player
+
+        return 0
+
+    def is_over(self) -> bool:
+        """
+        Return whether the game in this BattleState is over.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (100, 0), (20, 5),
+        ...                 (0, 1))
+        >>> s.is_over()
+        True
+        """
+        if 0 in self.hp:
+            return True
+
+        for player in self.queue:
+            if _available_actions(self.classes[player], self.sp[player]):
+                return False
+
+        return True
+
+    def get_winner(self) -> Union[int, None]:
+        """
+        Return the player who won the game in this BattleState, or None if
+        the game isn't over or is a tie.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (100, 0), (20, 5),
+        ...                 (0, 1))
+        >>> s.get_winner()
+        0
+        """
+        if not self.is_over():
+            return None
+
+        if self.hp[0] == 0:
+            return 1
+        elif self.hp[1] == 0:
+            return 0
+
+        return None
+
+    def get_score(self, player: int) -> int:
+        """
+        Return the score of this finished game for player: the winner's HP
+        if player won, -1 * the winner's HP if player lost, 0 for a tie.
+
+        >>> s = BattleState(False, ('mage', 'rogue'), (40, 0), (20, 5),
+        ...                 (0, 1))
+        >>> s.get_score(0)
+        40
+        >>> s.get_score(1)
+        -40
+        """
+        winner = self.get_winner()
+
+        if winner is None:
+            return 0
+        elif winner == player:
+            return self.hp[winner]
+
+        return self.hp[winner] * -1
+
+    def clean(self) -> 'BattleState':
+        """
+        Return this BattleState without the players at the front of the
+        queue who can't act, the way BattleQueue.peek() leaves a BattleQueue.
+
+        >>> s = BattleState(True, ('mage', 'rogue'), (100, 100), (0, 5),
+        ...                 (0, 1), ((0, 0), (1, 0)))
+        >>> s.clean()
+        BattleState(restricted=True, classes=('mage', 'rogue'), \
+hp=(100, 100), sp=(0, 5), queue=(1,), flags=((0, 0), (1, 0)))
+        """
+        battle = _Battle(self)
+        battle.peek()
+
+        return battle.to_state()
+
+    def apply(self, action: str) -> 'BattleState':
+        """
+        Return the BattleState after the next player performs action and is
+        removed from the queue, the same way producer() in a2_playstyle
+        builds the children of a BattleQueue. This BattleState is unchanged.
+
+        >>> s = BattleState(False, ('rogue', 'mage'), (100, 100),
+        ...                 (100, 100), (0, 1))
+        >>> s.apply('S')
+        BattleState(restricted=False, classes=('rogue', 'mage'), \
+hp=(100, 88), sp=(90, 100), queue=(1, 0, 0), flags=())
+        """
+        battle = _Battle(self)
+
+        if self.restricted:
+            battle.rebuild()
+
+        battle.perform(battle.peek(), action)
+
+        if not battle.is_empty():
+            battle.remove()
+
+        return battle.to_state()
+
+
+def _available_actions(character_type: str, sp: int) -> List[str]:
+    """
+    Return the actions a character of type character_type with sp SP can
+    perform.
+    """
+    available = []
+
+    if character_type == 'sorcerer':
+        if SORCERER_ATTACK_COST <= sp:
+            available.append('A')
+    elif SKILLS[character_type]['A'].get_sp_cost() <= sp:
+        available.append('A')
+
+    if SKILLS[character_type]['S'].get_sp_cost() <= sp:
+        available.append('S')
+
+    return available
+
+
+def sorcerer_skill(caster_hp: int, caster_sp: int, target_hp: int,
+                   target_sp: int) -> 'Skill':
+    """
+    Return the skill a Sorcerer with caster_hp HP and caster_sp SP picks
+    with the default SkillDecisionTree against a target with target_hp HP
+    and target_sp SP.
+
+    >>> type(sorcerer_skill(100, 100, 100, 100)).__name__
+    'RogueSpecial'
+    """
+    return DEFAULT_COMPILED_TREE.pick_skill_for_stats(caster_hp, caster_sp,
+                                                      target_hp, target_sp)
+
+
+def rules_fingerprint() -> str:
+    """
+    Return a fingerprint of the rules BattleState plays by: the defense of
+    each class, the cost, damage and effect on the queue of each skill, and
+    the rules of the default SkillDecisionTree. It changes whenever any of
+    them changes, so files of solved games can tell they are out of date.
+
+    >>> rules_fingerprint() == rules_fingerprint()
+    True
+    >>> len(rules_fingerprint())
+    16
+    """
+    rules = (sorted(DEFENSE.items()),
+             sorted((name, action, type(skill).__name__,
+                     skill.get_sp_cost(), skill.get_damage())
+                    for name in SKILLS
+                    for action, skill in SKILLS[name].items()),
+             SORCERER_ATTACK_COST,
+             sorted((skill.__name__, effect)
+                    for skill, effect in QUEUE_EFFECTS.items()),
+             sorted(skill.__name__ for skill in CLEARS_QUEUE),
+             [([(_describe_condition(condition), wanted)
+                for condition, wanted in checks],
+               type(skill).__name__, skill.get_sp_cost(), skill.get_damage())
+              for checks, skill in DEFAULT_COMPILED_TREE.rules])
+
+    return hashlib.blake2b(repr(rules).encode(), digest_size=8).hexdigest()
+
+
+def _describe_condition(condition: Callable) -> Any:
+    """
+    Return a description of the SkillDecisionTree condition condition that
+    changes whenever what it checks does.
+    """
+    comparison = getattr(condition, 'comparison', None)
+
+    if isinstance(comparison, StatComparison):
+        return (comparison.of_caster, comparison.stat,
+                comparison.comparison_operator, comparison.value)
+    elif isinstance(comparison, Always):
+        return comparison.result
+
+    # Any other condition is described by its code.
+    code = getattr(condition, '__code__', None)
+
+    return (getattr(condition, '__qualname__', type(condition).__name__),
+            code.co_code.hex() if code is not None else None,
+            repr(code.co_consts) if code is not None else None)
+
+
+class _Battle:
+    """
+    A mutable copy of a BattleState that BattleState.apply() plays a move
+    on, following the rules of BattleQueue, RestrictedBattleQueue and the
+    Characters.
+    """
+
+    def __init__(self, state: BattleState) -> None:
+        """
+        Initialize this _Battle as a copy of state.
+        """
+        self.restricted = state.restricted
+        self.classes = state.classes
+        self.hp = list(state.hp)
+        self.sp = list(state.sp)
+        self.content = list(state.queue)
+        self.real = list(state.flags)
+
+    def to_state(self) -> BattleState:
+        """
+        Return this _Battle as a BattleState.
+        """
+        return BattleState(self.restricted, self.classes, tuple(self.hp),
+                           tuple(self.sp), tuple(self.content),
+                           tuple(self.real))
+
+    def _clean_queue(self) -> None:
+        """
+        Remove the players at the front of the queue who can't act.
+        """
+        while self.content and not _available_actions(
+                self.classes[self.content[0]], self.sp[self.content[0]]):
+            self.content.pop(0)
+
+    def is_empty(self) -> bool:
+        """
+        Return whether nobody in the queue can act.
+        """
+        self._clean_queue()
+
+        return self.content == []
+
+    def peek(self) -> int:
+        """
+        Return the next player to act.
+        """
+        self._clean_queue()
+
+        return self.content[0] if self.content else 0
+
+    def add(self, player: int) -> None:
+        """
+        Add player to the queue.
+        """
+        if not self.restricted:
+            self.content.append(player)
+        elif self.real == [] or self.real[0][1] == 0:
+            flag = 0 if self.real.count((player, 0)) < 2 else 1
+
+            if player != 0 and len(self.real) > 1:
+                flag = 1
+
+            self.real.append((player, flag))
+            self.content.append(player)
+
+    def remove(self) -> int:
+        """
+        Remove and return the player at the front of the queue.
+        """
+        if self.restricted and self.real:
+            self.real.pop(0)
+
+        self._clean_queue()
+
+        return self.content.pop(0)
+
+    def rebuild(self) -> None:
+        """
+        Re-add the players in the queue the way RestrictedBattleQueue.copy()
+        does.
+        """
+        content = self.content
+
+        self.content = [0]
+        self.real = [(0, 0)]
+        if not self.is_empty():
+            self.remove()
+
+        for player in content:
+            self.add(player)
+
+    def _apply_damage(self, target: int, damage: int) -> None:
+        """
+        Deal damage to target, reduced by target's defense.
+        """
+        damage -= DEFENSE[self.classes[target]]
+        self.hp[target] = max(self.hp[target] - damage, 0)
+
+    def _use(self, skill: 'Skill', caster: int) -> None:
+        """
+        Make caster use skill on the other player.
+        """
+        target = 1 - caster
+
+        self.sp[caster] -= skill.get_sp_cost()
+        self._apply_damage(target, skill.get_damage())
+
+        if isinstance(skill, CLEARS_QUEUE):
+            while not self.is_empty():
+                self.remove()
+
+        for who in QUEUE_EFFECTS[type(skill)]:
+            self.add(caster if who == 'c' else target)
+
+    def perform(self, caster: int, action: str) -> None:
+        """
+        Make caster perform action on the other player.
+        """
+        character_type = self.classes[caster]
+        target = 1 - caster
+        target_hp = self.hp[target]
+
+        if character_type == 'sorcerer' and action == 'A':
+            skill = sorcerer_skill(self.hp[caster], self.sp[caster],
+                                   self.hp[target], self.sp[target])
+            remaining_sp = self.sp[caster] - SORCERER_ATTACK_COST
+
+            self._use(skill, caster)
+            self.sp[caster] = max(remaining_sp, 0)
+        else:
+            self._use(SKILLS[character_type][action], caster)
+
+        if character_type == 'vampire':
+            self.hp[caster] += target_hp - self.hp[target]
+
+
+def to_battle_state(battle_queue: 'BattleQueue') -> BattleState:
+    """
+    Return the BattleState of the game being carried out in battle_queue.
+
+    >>> from a2_playstyle import ManualPlaystyle, make_child
+    >>> import random
+    >>> same = []
+    >>> for queue_class in [BattleQueue, RestrictedBattleQueue]:
+    ...     for c1 in CHARACTER_CLASSES.values():
+    ...         for c2 in CHARACTER_CLASSES.values():
+    ...             bq = queue_class()
+    ...             p1 = c1("p1", bq, ManualPlaystyle(bq))
+    ...             p2 = c2("p2", bq, ManualPlaystyle(bq))
+    ...             p1.enemy = p2
+    ...             p2.enemy = p1
+    ...             bq.add(p1)
+    ...             bq.add(p2)
+    ...             while not bq.is_over():
+    ...                 action = random.choice(
+    ...                     bq.peek().get_available_actions())
+    ...                 state = to_battle_state(bq).apply(action)
+    ...                 bq = make_child(bq, action)
+    ...                 same += [to_battle_state(bq) == state]
+    >>> all(same)
+    True
+    """
+    signature = battle_queue.get_signature()
+    (class1, hp1, sp1), (class2, hp2, sp2), queue = signature[:3]
+    flags = signature[3] if len(signature) > 3 else ()
+
+    return BattleState(isinstance(battle_queue, RestrictedBattleQueue),
+                       (class1, class2), (hp1, hp2), (sp1, sp2), queue, flags)
+
+
+def uses_default_trees(battle_queue: 'BattleQueue') -> bool:
+    """
+    Return whether every Sorcerer in battle_queue picks its attacks with
+    DEFAULT_TREE, so the game can be played as a BattleState.
+
+    >>> from a2_characters import Mage
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> from a2_skill_decision_tree import SkillDecisionTree, general
+    >>> from a2_skills import ROGUE_SPECIAL
+    >>> bq = BattleQueue()
+    >>> s = Sorcerer("s", bq, ManualPlaystyle(bq))
+    >>> m = Mage("m", bq, ManualPlaystyle(bq))
+    >>> s.enemy = m
+    >>> m.enemy = s
+    >>> bq.add(s)
+    >>> bq.add(m)
+    >>> uses_default_trees(bq)
+    True
+    >>> s.set_skill_decision_tree(SkillDecisionTree(ROGUE_SPECIAL, general,
+    ...                                             1))
+    >>> uses_default_trees(bq)
+    False
+    """
+    return all(player.default is DEFAULT_TREE
+               for player in battle_queue.get_players()
+               if isinstance(player, Sorcerer))
+
+
+def player_index(battle_queue: 'BattleQueue', first_player: str) -> int:
+    """
+    Return the index, in the BattleStates of battle_queue, of the player
+    named first_player. If both players have that name, the next player in
+    battle_queue is the one meant, as it is for search_root() in
+    a2_playstyle, so it is found by identity instead.
+
+    >>> from a2_characters import Mage, Rogue
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> bq = BattleQueue()
+    >>> r = Rogue("Sophia", bq, ManualPlaystyle(bq))
+    >>> m = Mage("Sophia", bq, ManualPlaystyle(bq))
+    >>> r.enemy = m
+    >>> m.enemy = r
+    >>> bq.add(r)
+    >>> bq.add(m)
+    >>> bq.remove()
+    Sophia (Rogue): 100/100
+    >>> player_index(bq, "Sophia")
+    1
+    """
+    p1, p2 = battle_queue.get_players()
+
+    if p1.get_name() != p2.get_name():
+        return 0 if p1.get_name() == first_player else 1
+
+    return 0 if battle_queue.peek() is p1 else 1
+
+
+def to_battle_queue(state: BattleState, playstyle_class: type,
+                    names: Tuple[str, str] = ('p1', 'p2')) -> 'BattleQueue':
+    """
+    Return a new BattleQueue carrying out the game in state, with players
+    named names that use a playstyle_class Playstyle.
+
+    >>> from a2_playstyle import ManualPlaystyle
+    >>> s = BattleState(True, ('rogue', 'mage'), (100, 88), (90, 100),
+    ...                 (1, 0, 0), ((1, 0), (0, 0), (0, 1)))
+    >>> bq = to_battle_queue(s, ManualPlaystyle)
+    >>> bq
+    p2 (Mage): 88/100 -> p1 (Rogue): 100/90 -> p1 (Rogue): 100/90
+    >>> to_battle_state(bq) == s
+    True
+    """
+    battle_queue = RestrictedBattleQueue() if state.restricted \
+        else BattleQueue()
+    players = []
+
+    for i in range(2):
+        character = CHARACTER_CLASSES[state.classes[i]](
+            names[i], battle_queue, playstyle_class(battle_queue))
+        character.set_hp(state.hp[i])
+        character.set_sp(state.sp[i])
+        players.append(character)
+
+    players[0].enemy = players[1]
+    players[1].enemy = players[0]
+    battle_queue.add(players[0])
+
+    content = [players[player] for player in state.queue]
+
+    if state.restricted:
+        battle_queue.restore((content, [[players[player], flag]
+                                        for player, flag in state.flags]))
+    else:
+        battle_queue.restore(content)
+
+    return battle_queue
@@ -2,10 +2,14 @@
 The Character classes
 """
 from typing import List
-from a2_skills import MageAttack, MageSpecial, RogueAttack, RogueSpecial, \
-    VampireAttack, VampireSpecial, SorcererSpecial, SorcererAttack
+from a2_skills import MAGE_ATTACK, MAGE_SPECIAL, ROGUE_ATTACK, \
+    ROGUE_SPECIAL, VAMPIRE_ATTACK, VAMPIRE_SPECIAL, SORCERER_SPECIAL, \
+    sorcerer_attack
 
-from a2_skill_decision_tree import create_default_tree
+from a2_skill_decision_tree import create_default_tree, DEFAULT_TREE, \
+    DEFAULT_COMPILED_TREE
+import a2_zobrist
+from a2_zobrist import type_key, stats_hash, check_hash, HP_KEYS, SP_KEYS
 
 class Character:
     """
@@ -17,6 +21,8 @@ class Character:
     """
     battle_queue: 'BattleQueue'
     playstyle: 'Playstyle'
+    # The defense of every Character of a class, read by a2_battle_state.
+    _defense = 0
 
     def __init__(self, name: str, bq: 'BattleQueue', ps: 'Playstyle') -> None:
         """
@@ -28,7 +34,7 @@ class Character:
         self.playstyle = ps
         self._hp = 100
         self._sp = 100
-        self._defense = 0
+        self._hash = stats_hash(self._hp, self._sp)
         self.enemy = None
 
         self._character_type = ''
@@ -119,6 +125,7 @@ class Character:
         """
         Reduce this Character's SP by cost.
         """
+        self._hash ^= SP_KEYS[self._sp] ^ SP_KEYS[self._sp - cost]
         self._sp -= cost
 
     def apply_damage(self, damage: int) -> None:
@@ -127,21 +134,63 @@ class Character:
         defense.
         """
         damage -= self._defense
+        self._hash ^= HP_KEYS[self._hp]
         self._hp -= damage
         self._hp = max(self._hp, 0)
+        self._hash ^= HP_KEYS[self._hp]
 
     def set_sp(self, new_sp: int) -> None:
         """
         Sets this Character's SP to new_sp.
         """
+        self._hash ^= SP_KEYS[self._sp] ^ SP_KEYS[new_sp]
         self._sp = new_sp
 
     def set_hp(self, new_hp: int) -> None:
         """
         Sets this Character's HP to new_hp.
         """
+        self._hash ^= HP_KEYS[self._hp] ^ HP_KEYS[new_hp]
         self._hp = new_hp
 
+    def get_hp_bound(self) -> int:
+        """
+        Return the most HP this Character can have at any later point in the
+        game.
+        """
+        return self._hp
+
+    def get_signature(self) -> tuple:
+        """
+        Return a hashable summary of this Character's game state: its class,
+        HP and SP.
+        """
+        return (self._character_type, self._hp, self._sp)
+
+    def get_hash(self) -> int:
+        """
+        Return a 64-bit hash of this Character's class, HP and SP, kept up
+        to date as they change.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> bq = BattleQueue()
+        >>> m = Mage("m", bq, ManualPlaystyle(bq))
+        >>> m2 = Mage("m2", bq, ManualPlaystyle(bq))
+        >>> m.reduce_sp(10)
+        >>> m.apply_damage(20)
+        >>> m.get_hash() == m2.get_hash()
+        False
+        >>> m2.set_sp(90)
+        >>> m2.set_hp(88)
+        >>> m.get_hash() == m2.get_hash()
+        True
+        """
+        if a2_zobrist.VERIFY_HASHES:
+            check_hash(self._hash, stats_hash(self._hp, self._sp))
+
+        return self._hash ^ type_key(self._character_type)
+
     def __repr__(self):
         """
         Return a representation of this Character in the format:
@@ -175,6 +224,7 @@ class Mage(Character):
     """
     battle_queue: 'BattleQueue'
     playstyle: 'Playstyle'
+    _defense = 8
 
     def __init__(self, name: str, bq: 'BattleQueue', ps: 'Playstyle') -> None:
         """
@@ -193,9 +243,8 @@ class Mage(Character):
         """
         super().__init__(name, bq, ps)
         self._character_type = 'mage'
-        self._skills['A'] = MageAttack()
-        self._skills['S'] = MageSpecial()
-        self._defense = 8
+        self._skills['A'] = MAGE_ATTACK
+        self._skills['S'] = MAGE_SPECIAL
 
     def copy(self, new_battle_queue: 'BattleQueue') -> 'Mage':
         """
@@ -240,6 +289,7 @@ class Rogue(Character):
     """
     battle_queue: 'BattleQueue'
     playstyle: 'Playstyle'
+    _defense = 10
 
     def __init__(self, name: str, bq: 'BattleQueue', ps: 'Playstyle') -> None:
         """
@@ -258,9 +308,8 @@ class Rogue(Character):
         """
         super().__init__(name, bq, ps)
         self._character_type = 'rogue'
-        self._skills['A'] = RogueAttack()
-        self._skills['S'] = RogueSpecial()
-        self._defense = 10
+        self._skills['A'] = ROGUE_ATTACK
+        self._skills['S'] = ROGUE_SPECIAL
 
     def copy(self, new_battle_queue: 'BattleQueue') -> 'Rogue':
         """
@@ -302,7 +351,11 @@ class Sorcerer(Character):
     battle_queue - the BattleQueue that this Sorcerer will add to.
     playstyle - the Playstyle that this Sorcerer uses to pick actions.
     enemy - the charecter that this Sorcerer attacks.
+    default - the SkillDecisionTree this Sorcerer picks its attacks with,
+              the frozen DEFAULT_TREE unless set_skill_decision_tree() was
+              called.
     """
+    _defense = 10
 
     def __init__(self, name: str, bq: 'BattleQueue', ps: 'Playstyle') -> None:
 
@@ -319,17 +372,21 @@ class Sorcerer(Character):
         >>> c2.enemy = c
         >>> c
         r (Sorcerer): 100/100
+        >>> c.default.children[0].priority = 0
+        Traceback (most recent call last):
+        ...
+        AttributeError: a frozen SkillDecisionTree can't be changed
         """
 
         super().__init__(name, bq, ps)
         self._character_type = 'sorcerer'
 
-        self._skills['S'] = SorcererSpecial()
-
-        self._defense = 10
+        self._skills['S'] = SORCERER_SPECIAL
 
-        self.default = create_default_tree()
-        self._skills['A'] = SorcererAttack(self.default.pick_skill(self, self))
+        self.default = DEFAULT_TREE
+        self._compiled_tree = DEFAULT_COMPILED_TREE
+        self._skills['A'] = sorcerer_attack(
+            self._compiled_tree.pick_skill(self, self))
 
 
 
@@ -366,6 +423,9 @@ class Sorcerer(Character):
         copy = Sorcerer(self._name, new_battle_queue,
                         self.playstyle.copy(new_battle_queue))
         self._set_copy_attributes(copy)
+        # The copy shares the compiled tree, and the picks it remembers.
+        copy.default = self.default
+        copy._compiled_tree = self._compiled_tree
         return copy
 
     def attack(self) -> None:
@@ -388,8 +448,7 @@ class Sorcerer(Character):
 
         """
         self._skills['A'] = \
-            SorcererAttack\
-                (self.default.pick_skill(self, self.enemy))
+            sorcerer_attack(self._compiled_tree.pick_skill(self, self.enemy))
         real_depletion = self.get_sp() - 15
 
         self._current_state = 'attack'
@@ -425,6 +484,12 @@ class Sorcerer(Character):
 
         self.default = default
 
+        # A new compiled tree remembers none of the picks of the old one.
+        if default is DEFAULT_TREE:
+            self._compiled_tree = DEFAULT_COMPILED_TREE
+        else:
+            self._compiled_tree = default.compile()
+
 
 
 class Vampire(Character):
@@ -435,6 +500,7 @@ class Vampire(Character):
     playstyle - the Playstyle that this Vampire uses to pick actions.
     enemy - the charecter that this Vampire attacks.
     """
+    _defense = 3
 
     def __init__(self, name: 'str', bq: 'BattleQueue', ps: 'Playstyle') -> None:
         """
@@ -454,9 +520,8 @@ class Vampire(Character):
 
         super().__init__(name, bq, ps)
         self._character_type = 'vampire'
-        self._skills['A'] = VampireAttack()
-        self._skills['S'] = VampireSpecial()
-        self._defense = 3
+        self._skills['A'] = VAMPIRE_ATTACK
+        self._skills['S'] = VAMPIRE_SPECIAL
 
     def copy(self, new_battle_queue: 'BattleQueue') -> 'Charecter':
         """
@@ -484,6 +549,25 @@ class Vampire(Character):
         self._set_copy_attributes(copy)
         return copy
 
+    def get_hp_bound(self) -> int:
+        """
+        Return the most HP this Vampire can have at any later point in the
+        game. A Vampire heals by the damage it deals, so it can gain at most
+        its enemy's HP.
+
+        >>> from a2_battle_queue import BattleQueue
+        >>> from a2_playstyle import ManualPlaystyle
+        >>> bq = BattleQueue()
+        >>> c = Vampire("r", bq, ManualPlaystyle(bq))
+        >>> c2 = Vampire("r2", bq, ManualPlaystyle(bq))
+        >>> c.enemy = c2
+        >>> c2.enemy = c
+        >>> c2.set_hp(30)
+        >>> c.get_hp_bound()
+        130
+        """
+        return self._hp + self.enemy.get_hp()
+
     def attack(self) -> None:
         """
         Perform an attack on this Character's enemy.
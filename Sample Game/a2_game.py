@@ -3,10 +3,15 @@ The Main game
 
 # written by Sophia Hyun
 """
+from concurrent.futures import Future
+import copy
+import threading
 from a2_battle_queue import BattleQueue, RestrictedBattleQueue
-from a2_playstyle import ManualPlaystyle, RandomPlaystyle, RecursiveMiniMax, IterativeMiniMax
+from a2_playstyle import ManualPlaystyle, RandomPlaystyle, RecursiveMiniMax, IterativeMiniMax, MonteCarloPlaystyle, ExpectimaxPlaystyle
 from a2_characters import Mage, Rogue, Vampire, Sorcerer
-from a2_skill_decision_tree import create_default_tree
+from a2_skill_decision_tree import DEFAULT_TREE
+from a2_tablebase import open_tablebase
+from a2_result_cache import open_result_cache
 
 CHARACTER_CLASSES = {'m': Mage,
                      'r': Rogue,
@@ -17,13 +22,27 @@ CHARACTER_CLASSES = {'m': Mage,
 PLAYSTYLE_CLASSES = {'m': ManualPlaystyle,
                      'r': RandomPlaystyle,
                      'mr': RecursiveMiniMax,
-                     'mi': IterativeMiniMax
+                     'mi': IterativeMiniMax,
+                     'mc': MonteCarloPlaystyle,
+                     'e': ExpectimaxPlaystyle
                     }
 
 BATTLE_QUEUE_CLASSES = {'n': BattleQueue,
                         'r': RestrictedBattleQueue
                         }
 
+# The tablebase built by a2_tablebase, or None if it hasn't been built.
+TABLEBASE = open_tablebase()
+
+# Set to a file name to keep the moves minimax playstyles pick between games
+# (see a2_result_cache).
+RESULT_CACHE_PATH = None
+RESULT_CACHE = open_result_cache(RESULT_CACHE_PATH) if RESULT_CACHE_PATH \
+    else None
+
+# Whether minimax playstyles search ahead while their opponent is deciding
+PONDER = False
+
 BATTLE_QUEUE = None
 LAST_KEY_PRESSED = None
 P1 = None
@@ -31,6 +50,11 @@ P2 = None
 GAME_IS_OVER = False
 GAME_WINNER = None
 
+# The attack a computer playstyle is selecting on a background thread and
+# whether one is being selected
+MOVE_FUTURE = None
+THINKING = False
+
 def perform_attack():
     """
     Uses the next character's playstyle to decide on and perform an attack.
@@ -46,6 +70,80 @@ def perform_attack():
     else:
         move_to_make = playstyle.select_attack()
 
+    make_attack(next_character, move_to_make)
+
+def perform_attack_async():
+    """
+    Like perform_attack(), for a next character whose playstyle isn't
+    manual, without waiting for the playstyle: the first call starts it
+    selecting an attack on a background thread, and the call after it is
+    selected performs the attack. THINKING is True in between.
+
+    Returns whether the attack was performed.
+    """
+    global MOVE_FUTURE, THINKING
+
+    next_character = BATTLE_QUEUE.peek()
+
+    if MOVE_FUTURE is None:
+        # The playstyle searches a copy of the battle queue taken here, so
+        # update_ui() can keep using BATTLE_QUEUE in the meantime
+        playstyle = copy.copy(next_character.playstyle)
+        playstyle.battle_queue = BATTLE_QUEUE.copy()
+        MOVE_FUTURE = Future()
+        # A daemon thread, so quitting doesn't wait for the search to end
+        threading.Thread(target=select_attack_into,
+                         args=(playstyle, MOVE_FUTURE), daemon=True).start()
+        THINKING = True
+
+    if not MOVE_FUTURE.done():
+        return False
+
+    move_to_make = MOVE_FUTURE.result()
+    MOVE_FUTURE = None
+    THINKING = False
+    make_attack(next_character, move_to_make)
+
+    return True
+
+def select_attack_into(playstyle, future):
+    """
+    Sets the result of future to the attack playstyle selects, unless
+    future was cancelled first.
+    """
+    if not future.set_running_or_notify_cancel():
+        return
+
+    try:
+        future.set_result(playstyle.select_attack())
+    except BaseException as error:
+        future.set_exception(error)
+
+def stop_thinking():
+    """
+    Gives up on the attack being selected, if there is one, and stops the
+    worker processes of parallel minimax playstyles without waiting for
+    them. Called when the game is quit.
+    """
+    global MOVE_FUTURE, THINKING
+
+    if MOVE_FUTURE is not None:
+        MOVE_FUTURE.cancel()
+        MOVE_FUTURE = None
+        THINKING = False
+
+    for character in [P1, P2]:
+        if character is not None and \
+                isinstance(character.playstyle, RecursiveMiniMax):
+            character.playstyle.shutdown(wait=False)
+
+def make_attack(next_character, move_to_make):
+    """
+    Makes next_character, the next character, perform move_to_make and
+    updates the state of the game.
+    """
+    global GAME_IS_OVER, GAME_WINNER
+
     # Check if the next_character can make that action ('A' represents
     # a normal attack, 'S' represents a special attack.)
     # If a move that is not 'A' or 'S' is passed in, this should return False.
@@ -68,6 +166,18 @@ def perform_attack():
     # should return None. Otherwise, it should return the character that won.
     GAME_WINNER = BATTLE_QUEUE.get_winner()
 
+    start_pondering()
+
+    # Write the moves the minimax playstyles picked to the result cache
+    if GAME_IS_OVER and RESULT_CACHE is not None:
+        RESULT_CACHE.flush()
+
+    # Stop the worker processes of parallel minimax playstyles
+    if GAME_IS_OVER:
+        for character in BATTLE_QUEUE.get_players():
+            if isinstance(character.playstyle, RecursiveMiniMax):
+                character.playstyle.shutdown()
+
 def set_up_game():
     """
     Sets up the battle queue and characters for the game.
@@ -97,7 +207,9 @@ def set_up_game():
         player_1_playstyle = input("Select a playstyle for the first " +
                                    "character (m for Manual, r for Random, " +
                                    "mr for Minimax (Recursive), " +
-                                   "mi for Minimax (Iterative)): ")
+                                   "mi for Minimax (Iterative), " +
+                                   "mc for Monte Carlo, " +
+                                   "e for Expectimax): ")
         player_1_playstyle = player_1_playstyle.strip()
 
     # Get the parameters for the second character
@@ -115,7 +227,9 @@ def set_up_game():
         player_2_playstyle = input("Select a playstyle for the second " +
                                    "character (m for Manual, r for Random, " +
                                    "mr for Minimax (Recursive), " +
-                                   "mi for Minimax (Iterative)): ")
+                                   "mi for Minimax (Iterative), " +
+                                   "mc for Monte Carlo, " +
+                                   "e for Expectimax): ")
         player_2_playstyle = player_2_playstyle.strip()
 
     # Store the classes in other variable names for convenience
@@ -124,6 +238,13 @@ def set_up_game():
     p1_playstyle = PLAYSTYLE_CLASSES[player_1_playstyle](BATTLE_QUEUE)
     p2_playstyle = PLAYSTYLE_CLASSES[player_2_playstyle](BATTLE_QUEUE)
 
+    # Minimax playstyles look their moves up in the tablebase, if there is one
+    for playstyle in [p1_playstyle, p2_playstyle]:
+        if isinstance(playstyle, (RecursiveMiniMax, IterativeMiniMax)):
+            playstyle.tablebase = TABLEBASE
+            playstyle.cache = RESULT_CACHE
+            playstyle.pondering = PONDER
+
     # Call the corresponding __init__ for each player's character class
     # The parameters passed in are: their name, the battle queue and an
     # instance of their playstyle
@@ -131,12 +252,10 @@ def set_up_game():
     P2 = P2_Character(player_2_name, BATTLE_QUEUE, p2_playstyle)
 
     if player_1 == 's':
-        default_tree = create_default_tree()
-        P1.set_skill_decision_tree(default_tree)
+        P1.set_skill_decision_tree(DEFAULT_TREE)
 
     if player_2 == 's':
-        default_tree = create_default_tree()
-        P2.set_skill_decision_tree(default_tree)
+        P2.set_skill_decision_tree(DEFAULT_TREE)
 
     # Set the enemy attribute of the characters
     # You can assume this will be called before any attacks are performed
@@ -147,6 +266,22 @@ def set_up_game():
     BATTLE_QUEUE.add(P1)
     BATTLE_QUEUE.add(P2)
 
+    start_pondering()
+
+def start_pondering():
+    """
+    Lets the minimax playstyle of the character who isn't next search ahead
+    while the next character decides on a move.
+    """
+    if not BATTLE_QUEUE.is_over():
+        next_character = BATTLE_QUEUE.peek()
+
+        for character in [P1, P2]:
+            if character is not next_character and \
+                    isinstance(character.playstyle,
+                               (RecursiveMiniMax, IterativeMiniMax)):
+                character.playstyle.start_pondering()
+
 def update_ui():
     """
     Return the parameters to update the UI for the game.
@@ -193,6 +328,7 @@ def update_ui():
                   'p1_name': p1_name,
                   'p2_name': p2_name,
                   'actions': current_available_actions,
-                  'current_player': current_player}
+                  'current_player': current_player,
+                  'thinking': THINKING}
 
     return ui_to_draw
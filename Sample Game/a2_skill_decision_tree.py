@@ -1,5 +1,14 @@
-from typing import Callable, List
-from a2_skills import MageAttack, MageSpecial, RogueAttack, RogueSpecial
+from typing import Any, Callable, List, Tuple
+from collections import OrderedDict
+import operator
+import threading
+from a2_skills import MageAttack, MageSpecial, RogueAttack, RogueSpecial, \
+    MAGE_ATTACK, MAGE_SPECIAL, ROGUE_ATTACK, ROGUE_SPECIAL
+
+DEFAULT_MEMO_SIZE = 50000
+# The operators a StatComparison can compare with.
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt,
+             '>=': operator.ge, '==': operator.eq}
 
 
 class SkillDecisionTree:
@@ -11,21 +20,29 @@ class SkillDecisionTree:
     priority - the priority number of this SkillDecisionTree.
                You may assume priority numbers are unique (i.e. no two
                SkillDecisionTrees will have the same number.)
-    children - the subtrees of this SkillDecisionTree.
+    children - the subtrees of this SkillDecisionTree, a tuple once it is
+               frozen.
+    stat_pure - whether every condition in this SkillDecisionTree only
+                looks at the HP and SP of the caster and the target, so the
+                skill picked for the same HP and SP can be remembered.
     """
     value: 'Skill'
     condition: Callable[['Character', 'Character'], bool]
     priority: int
     children: List['SkillDecisionTree']
+    stat_pure: bool
+    _frozen = False
 
     def __init__(self, value: 'Skill',
                  condition: Callable[['Character', 'Character'], bool],
                  priority: int,
-                 children: List['SkillDecisionTree'] = None):
+                 children: List['SkillDecisionTree'] = None,
+                 stat_pure: bool = False):
         """
         Initialize this SkillDecisionTree with the value value, condition
         function condition, priority number priority, and the children in
-        children, if provided.
+        children, if provided. stat_pure says whether its conditions only
+        look at HP and SP.
 
         >>> from a2_skills import MageAttack
         >>> def f(caster, target):
@@ -40,6 +57,43 @@ class SkillDecisionTree:
         self.condition = condition
         self.priority = priority
         self.children = children[:] if children else []
+        self.stat_pure = stat_pure
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """
+        Set the attribute name of this SkillDecisionTree to value, unless
+        it is frozen.
+
+        >>> t = SkillDecisionTree(MAGE_ATTACK, general, 1).freeze()
+        >>> t.priority = 2
+        Traceback (most recent call last):
+        ...
+        AttributeError: a frozen SkillDecisionTree can't be changed
+        """
+        if self._frozen:
+            raise AttributeError("a frozen SkillDecisionTree can't be changed")
+
+        super().__setattr__(name, value)
+
+    def freeze(self) -> 'SkillDecisionTree':
+        """
+        Make this SkillDecisionTree and all of its subtrees immutable, so
+        that they can be shared, and return it. Their children become
+        tuples and none of their attributes can be set.
+
+        >>> t = create_default_tree().freeze()
+        >>> t.children[0].children.append(t)
+        Traceback (most recent call last):
+        ...
+        AttributeError: 'tuple' object has no attribute 'append'
+        """
+        for child in self.children:
+            child.freeze()
+
+        super().__setattr__('children', tuple(self.children))
+        super().__setattr__('_frozen', True)
+
+        return self
 
 
     def collector(self, caster, target):
@@ -119,7 +173,516 @@ class SkillDecisionTree:
         oj = k1.index(min(k1))
         return k2[oj]
 
+    def pick_skill_ids(self, caster_hp: Any, caster_sp: Any, target_hp: Any,
+                       target_sp: Any, skill_types: List[type]) -> Any:
+        """
+        Return the skill picked for each caster and target whose HP and SP
+        are in the arrays caster_hp, caster_sp, target_hp and target_sp, as
+        an array of the indices of the skills' types in skill_types, or -1
+        where no skill is picked. See
+        CompiledSkillDecisionTree.pick_skill_ids(); compile this
+        SkillDecisionTree once instead when picking more than once.
+
+        This needs NumPy.
+
+        >>> import numpy as np
+        >>> types = [MageAttack, MageSpecial, RogueAttack, RogueSpecial]
+        >>> create_default_tree().pick_skill_ids(
+        ...     np.array([95, 40]), np.array([30, 10]), np.array([20, 20]),
+        ...     np.array([50, 50]), types).tolist()
+        [2, 0]
+        """
+        return self.compile().pick_skill_ids(caster_hp, caster_sp, target_hp,
+                                             target_sp, skill_types)
 
+    def compile(self, memo_size: int = DEFAULT_MEMO_SIZE) \
+            -> 'CompiledSkillDecisionTree':
+        """
+        Return a CompiledSkillDecisionTree that picks the same skills as
+        this SkillDecisionTree, remembering at most memo_size picks if this
+        SkillDecisionTree is stat_pure.
+
+        >>> from a2_characters import Rogue
+        >>> from a2_battle_queue import BattleQueue
+        >>> k = Rogue('x', BattleQueue(), "pop")
+        >>> j = Rogue('x', BattleQueue(), "pop")
+        >>> k._hp = 95
+        >>> k._sp = 30
+        >>> j._hp = 20
+        >>> j._sp = 50
+        >>> type(create_default_tree().compile().pick_skill(k, j))
+        <class 'a2_skills.RogueAttack'>
+        """
+        rules = []
+        to_visit = [(self, ())]
+
+        while to_visit:
+            tree, path = to_visit.pop()
+
+            # tree's skill is collected if the conditions of the trees
+            # above it hold and its own doesn't.
+            rules.append((tree.priority,
+                          path + ((tree.condition, False),), tree.value))
+
+            for child in tree.children:
+                to_visit.append((child, path + ((tree.condition, True),)))
+
+        rules.sort(key=lambda rule: rule[0])
+
+        return CompiledSkillDecisionTree(tuple((checks, skill)
+                                               for _, checks, skill in rules),
+                                         self.stat_pure, memo_size)
+
+
+class CompiledSkillDecisionTree:
+    """
+    A SkillDecisionTree flattened into the checks it makes: one rule for
+    each of its trees, in order of priority. A rule is the conditions that
+    must hold, or not hold, for the skill of that tree to be collected, so
+    the first rule whose checks all pass gives the skill pick_skill()
+    returns. Its rules are never changed, so it can be shared.
+
+    pick_skill() doesn't try the rules one by one, though: it walks the
+    trees again, from walk, where each tree is followed by its subtrees.
+    When a tree's condition doesn't hold, the walk skips to the entry after
+    its subtrees, and a tree whose subtrees can't give a skill of lower
+    priority than the one already found is skipped without being checked.
+
+    If the tree is stat_pure, the skill picked for each HP and SP of the
+    caster and the target is remembered, and the least recently used pick
+    is forgotten once memo_size of them are remembered. Compiling the tree
+    again gives a CompiledSkillDecisionTree that remembers nothing.
+
+    rules - a (checks, skill) pair for each tree, where checks are
+            (condition, result) pairs, in order of priority.
+    walk - a (condition, skill, priority, lowest, skip) entry for each tree,
+           where lowest is the lowest priority in the tree and its subtrees
+           and skip is the index of the entry after them. Subtrees with
+           the lowest priorities come first.
+    stat_pure - whether the picks are remembered.
+    memo_size - the most picks remembered.
+    """
+    rules: Tuple[Tuple[Tuple[Tuple[Callable, bool], ...], 'Skill'], ...]
+    walk: Tuple[Tuple[Callable, 'Skill', int, int, int], ...]
+    stat_pure: bool
+    memo_size: int
+
+    def __init__(self, rules: Tuple[Tuple[Tuple[Tuple[Callable, bool], ...],
+                                          'Skill'], ...],
+                 stat_pure: bool = False,
+                 memo_size: int = DEFAULT_MEMO_SIZE) -> None:
+        """
+        Initialize this CompiledSkillDecisionTree with the rules rules,
+        remembering at most memo_size picks if stat_pure.
+        """
+        self.rules = rules
+        self.walk = _walk_of(rules)
+        self.stat_pure = stat_pure
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        # Sorcerers pick skills on several threads (pondering, a2_game's
+        # worker), so the memo is only used with this lock held.
+        self._memo_lock = threading.Lock()
+
+    def pick_skill(self, caster: 'Character', target: 'Character') -> 'Skill':
+        """
+        Return the skill SkillDecisionTree.pick_skill() picks for caster
+        and target, checking each tree's condition at most once.
+
+        >>> from a2_characters import Rogue
+        >>> from a2_battle_queue import BattleQueue
+        >>> k = Rogue('x', BattleQueue(), "pop")
+        >>> j = Rogue('x', BattleQueue(), "pop")
+        >>> k._hp = 95
+        >>> k._sp = 30
+        >>> j._hp = 20
+        >>> j._sp = 50
+        >>> type(DEFAULT_COMPILED_TREE.pick_skill(k, j))
+        <class 'a2_skills.RogueAttack'>
+        """
+        if self.stat_pure:
+            return self.pick_skill_for_stats(caster.get_hp(), caster.get_sp(),
+                                             target.get_hp(), target.get_sp())
+
+        return self._evaluate(caster, target)
+
+    def pick_skill_for_stats(self, caster_hp: int, caster_sp: int,
+                             target_hp: int, target_sp: int) -> 'Skill':
+        """
+        Return the skill picked for a caster with caster_hp HP and caster_sp
+        SP against a target with target_hp HP and target_sp SP. The
+        conditions are only given the HP and SP of the players, so the tree
+        should be stat_pure.
+
+        >>> t = create_default_tree().compile(memo_size=2)
+        >>> type(t.pick_skill_for_stats(95, 30, 20, 50)).__name__
+        'RogueAttack'
+        >>> s = t.pick_skill_for_stats(95, 30, 20, 50)
+        >>> t.pick_skill_for_stats(95, 30, 20, 50) is s
+        True
+        >>> type(t.pick_skill_for_stats(40, 10, 20, 50)).__name__
+        'MageAttack'
+        >>> type(t.pick_skill_for_stats(100, 100, 100, 100)).__name__
+        'RogueSpecial'
+        >>> len(t._memo)
+        2
+
+        The memo can be used from several threads at once:
+
+        >>> import sys
+        >>> switch_interval = sys.getswitchinterval()
+        >>> sys.setswitchinterval(1e-6)
+        >>> errors = []
+        >>> def pick_many():
+        ...     try:
+        ...         for i in range(20000):
+        ...             assert t.pick_skill_for_stats(i % 3, 1, 50, 50) is \\
+        ...                 MAGE_ATTACK
+        ...     except Exception as error:
+        ...         errors.append(error)
+        >>> threads = [threading.Thread(target=pick_many) for _ in range(4)]
+        >>> for thread in threads:
+        ...     thread.start()
+        >>> for thread in threads:
+        ...     thread.join()
+        >>> sys.setswitchinterval(switch_interval)
+        >>> errors
+        []
+        """
+        key = (caster_hp, caster_sp, target_hp, target_sp)
+        memo = self._memo
+
+        with self._memo_lock:
+            skill = memo.get(key)
+
+            if skill is not None:
+                memo.move_to_end(key)
+                return skill
+
+        skill = self._evaluate(Stats(caster_hp, caster_sp),
+                               Stats(target_hp, target_sp))
+
+        if self.stat_pure:
+            with self._memo_lock:
+                memo[key] = skill
+
+                if len(memo) > self.memo_size:
+                    memo.popitem(last=False)
+
+        return skill
+
+    def pick_skill_ids(self, caster_hp: Any, caster_sp: Any, target_hp: Any,
+                       target_sp: Any, skill_types: List[type]) -> Any:
+        """
+        Return the skill picked for each caster and target whose HP and SP
+        are in the arrays caster_hp, caster_sp, target_hp and target_sp, as
+        an array of the indices of the skills' types in skill_types, or -1
+        where no skill is picked.
+
+        Conditions with a StatComparison are checked for every row at once.
+        Any other condition is called once per row with the Stats of the
+        players, which is much slower.
+
+        This needs NumPy.
+
+        >>> import numpy as np
+        >>> types = [MageAttack, MageSpecial, RogueAttack, RogueSpecial]
+        >>> hp = np.arange(0, 101, 10)
+        >>> ids = DEFAULT_COMPILED_TREE.pick_skill_ids(hp, hp, 100 - hp,
+        ...                                            100 - hp, types)
+        >>> ids.tolist() == [types.index(type(
+        ...     DEFAULT_COMPILED_TREE.pick_skill_for_stats(h, h, 100 - h,
+        ...                                                100 - h)))
+        ...                  for h in hp]
+        True
+        >>> t = CompiledSkillDecisionTree(((((lambda c, t: c.get_hp() > 5,
+        ...                                   False),), MageSpecial()),))
+        >>> t.pick_skill_ids(hp, hp, hp, hp, types).tolist()[:3]
+        [1, -1, -1]
+        """
+        import numpy as np
+
+        stats = tuple(np.asarray(column) for column in
+                      (caster_hp, caster_sp, target_hp, target_sp))
+        size = len(stats[0])
+        ids = np.full(size, -1)
+        undecided = np.ones(size, dtype=bool)
+        results = {}
+
+        for checks, skill in self.rules:
+            passing = undecided.copy()
+
+            for condition, wanted in checks:
+                result = results.get(condition)
+
+                if result is None:
+                    result = _check_all(condition, stats)
+                    results[condition] = result
+
+                passing &= result == wanted
+
+                if not passing.any():
+                    break
+            else:
+                ids[passing] = skill_types.index(type(skill))
+                undecided &= ~passing
+
+                if not undecided.any():
+                    break
+
+        return ids
+
+    def _evaluate(self, caster: 'Character', target: 'Character',
+                  skipped: List[int] = None) -> 'Skill':
+        """
+        Return the skill of the first rule whose checks pass for caster and
+        target, or [] if there isn't one, by following walk. Add the number
+        of trees skipped without being checked to skipped[0].
+        """
+        walk = self.walk
+        size = len(walk)
+        picked = []
+        best = None
+        i = 0
+
+        while i < size:
+            condition, skill, priority, lowest, skip = walk[i]
+
+            if best is not None and lowest >= best:
+                if skipped is not None:
+                    skipped[0] += 1
+                i = skip
+            elif condition(caster, target):
+                i += 1
+            else:
+                if best is None or priority < best:
+                    picked, best = skill, priority
+                i = skip
+
+        return picked
+
+
+def _walk_of(rules: Tuple[Tuple[Tuple[Tuple[Callable, bool], ...], 'Skill'],
+                          ...]) \
+        -> Tuple[Tuple[Callable, 'Skill', int, int, int], ...]:
+    """
+    Return the walk of a CompiledSkillDecisionTree with rules rules: the
+    trees the rules came from, each followed by its subtrees.
+
+    A rule's last check is its own tree's condition, and the checks before
+    it are the trees above it, so a tree's subtrees are the rules whose
+    checks before their last are its own checks with its condition holding.
+    Subtrees with the same checks can't be told apart, but they hold
+    together, so they are walked as the subtrees of one of them.
+
+    >>> walk = _walk_of(DEFAULT_COMPILED_TREE.rules)
+    >>> [(priority, lowest, skip) for _, _, priority, lowest, skip in walk]
+    [(4, 0, 8), (0, 0, 3), (6, 6, 3), (1, 1, 5), (7, 7, 5), (2, 2, 8), \
+(3, 3, 8), (5, 5, 8)]
+    """
+    # A node is [condition, skill, priority, subtrees, lowest, size], where
+    # a rule's priority is its index.
+    subtrees = {}
+    nodes = []
+
+    for priority, (checks, skill) in enumerate(rules):
+        condition = checks[-1][0]
+        node = [condition, skill, priority, [], priority, 1]
+        subtrees[checks[:-1] + ((condition, True),)] = node[3]
+        nodes.append((checks[:-1], node))
+
+    roots = []
+    preorder = []
+
+    for above, node in nodes:
+        if above and above not in subtrees:
+            raise ValueError("the rules don't come from a SkillDecisionTree")
+        subtrees.get(above, roots).append(node)
+
+    to_visit = list(roots)
+
+    while to_visit:
+        node = to_visit.pop()
+        preorder.append(node)
+        to_visit.extend(node[3])
+
+    for node in reversed(preorder):
+        for child in node[3]:
+            node[4] = min(node[4], child[4])
+            node[5] += child[5]
+        node[3].sort(key=lambda child: child[4])
+
+    walk = []
+    to_visit = sorted(roots, key=lambda root: root[4], reverse=True)
+
+    while to_visit:
+        condition, skill, priority, children, lowest, size = to_visit.pop()
+        walk.append((condition, skill, priority, lowest, len(walk) + size))
+        to_visit.extend(reversed(children))
+
+    return tuple(walk)
+
+
+def _check_all(condition: Callable[['Character', 'Character'], bool],
+               stats: Tuple[Any, Any, Any, Any]) -> Any:
+    """
+    Return the result of condition for each row of stats, the arrays of the
+    caster's HP and SP and the target's HP and SP.
+    """
+    import numpy as np
+
+    comparison = getattr(condition, 'comparison', None)
+
+    if comparison is not None:
+        return np.broadcast_to(comparison.check_all(*stats), stats[0].shape)
+
+    return np.array([bool(condition(Stats(caster_hp, caster_sp),
+                                    Stats(target_hp, target_sp)))
+                     for caster_hp, caster_sp, target_hp, target_sp
+                     in zip(*stats)], dtype=bool)
+
+
+class StatComparison:
+    """
+    A condition that compares the HP or SP of the caster or the target with
+    a number. Unlike any other condition, a StatComparison can be checked
+    for many players at once, by pick_skill_ids().
+
+    of_caster - whether the caster's stat is compared, not the target's.
+    stat - the stat compared, 'hp' or 'sp'.
+    comparison_operator - the operator compared with, a key of OPERATORS.
+    value - the number the stat is compared with.
+    """
+    of_caster: bool
+    stat: str
+    comparison_operator: str
+    value: int
+
+    def __init__(self, of_caster: bool, stat: str, comparison_operator: str,
+                 value: int) -> None:
+        """
+        Initialize this StatComparison, which checks whether stat of the
+        caster, or the target if not of_caster, comparison_operator value.
+
+        >>> c = StatComparison(True, 'hp', '>', 50)
+        >>> c(Stats(60, 0), Stats(0, 0))
+        True
+        """
+        self.of_caster = of_caster
+        self.stat = stat
+        self.comparison_operator = comparison_operator
+        self.value = value
+        self._compare = OPERATORS[comparison_operator]
+
+    @property
+    def comparison(self) -> 'StatComparison':
+        """
+        Return this StatComparison, the comparison pick_skill_ids() checks
+        for it.
+        """
+        return self
+
+    def __call__(self, caster: 'Character', target: 'Character') -> bool:
+        """
+        Return whether this comparison holds for caster and target.
+        """
+        player = caster if self.of_caster else target
+        stat = player.get_hp() if self.stat == 'hp' else player.get_sp()
+
+        return self._compare(stat, self.value)
+
+    def check_all(self, caster_hp: Any, caster_sp: Any, target_hp: Any,
+                  target_sp: Any) -> Any:
+        """
+        Return whether this comparison holds for each row of the arrays
+        caster_hp, caster_sp, target_hp and target_sp.
+
+        >>> import numpy as np
+        >>> StatComparison(False, 'sp', '<', 10).check_all(
+        ...     None, None, None, np.array([5, 10])).tolist()
+        [True, False]
+        """
+        if self.of_caster:
+            column = caster_hp if self.stat == 'hp' else caster_sp
+        else:
+            column = target_hp if self.stat == 'hp' else target_sp
+
+        return self._compare(column, self.value)
+
+
+class Always:
+    """
+    The comparison of a condition that always gives the same result.
+
+    result - the result of the condition.
+    """
+    result: bool
+
+    def __init__(self, result: bool) -> None:
+        """
+        Initialize this Always, for a condition that always gives result.
+        """
+        self.result = result
+
+    def check_all(self, caster_hp: Any, caster_sp: Any, target_hp: Any,
+                  target_sp: Any) -> Any:
+        """
+        Return result, which holds for every row of the arrays caster_hp,
+        caster_sp, target_hp and target_sp.
+        """
+        return self.result
+
+
+def compares(comparison: Any) -> Callable[[Callable], Callable]:
+    """
+    Return a decorator that records that a condition function gives the
+    same result as comparison, a StatComparison or an Always, so that
+    pick_skill_ids() can check it for many players at once.
+
+    The conditions of the default tree agree with their comparisons:
+
+    >>> import numpy as np
+    >>> from itertools import product
+    >>> rows = list(product(range(0, 101, 10), repeat=4))
+    >>> columns = [np.array(column) for column in zip(*rows)]
+    >>> [np.broadcast_to(condition.comparison.check_all(*columns),
+    ...                  len(rows)).tolist() ==
+    ...  [condition(Stats(*row[:2]), Stats(*row[2:])) for row in rows]
+    ...  for condition in (checker1, checker2, checker3, checker4, checker5,
+    ...                    general)]
+    [True, True, True, True, True, True]
+    """
+    def record(condition: Callable) -> Callable:
+        condition.comparison = comparison
+        return condition
+
+    return record
+
+
+class Stats:
+    """
+    The HP and SP of a player, in the form a SkillDecisionTree condition
+    expects from a Character.
+    """
+
+    def __init__(self, hp: int, sp: int) -> None:
+        """
+        Initialize these Stats with hp HP and sp SP.
+        """
+        self._hp = hp
+        self._sp = sp
+
+    def get_hp(self) -> int:
+        """
+        Return the HP of these Stats.
+        """
+        return self._hp
+
+    def get_sp(self) -> int:
+        """
+        Return the SP of these Stats.
+        """
+        return self._sp
 
 
 def create_default_tree() -> SkillDecisionTree:
@@ -132,28 +695,30 @@ def create_default_tree() -> SkillDecisionTree:
     """
     # TODO: Return a SkillDecisionTree that matches the one in a2.pdf.
 
-    t2 = SkillDecisionTree(MageAttack(), checker2, 3,
-                           [SkillDecisionTree(RogueSpecial(),
+    t2 = SkillDecisionTree(MAGE_ATTACK, checker2, 3,
+                           [SkillDecisionTree(ROGUE_SPECIAL,
                                               checker3,
                                               4,
                                               [SkillDecisionTree
-                                               (RogueAttack(),
+                                               (ROGUE_ATTACK,
                                                 general, 6)])])
     t3 = SkillDecisionTree\
-        (MageSpecial(), checker4, 2,
-         [SkillDecisionTree(RogueAttack(),
+        (MAGE_SPECIAL, checker4, 2,
+         [SkillDecisionTree(ROGUE_ATTACK,
                             general, 8)])
     t4 = SkillDecisionTree(
-        RogueAttack(), checker5, 1,
-        [SkillDecisionTree(RogueSpecial(),
+        ROGUE_ATTACK, checker5, 1,
+        [SkillDecisionTree(ROGUE_SPECIAL,
                            general, 7)])
 
-    t1 = SkillDecisionTree(MageAttack(), checker1, 5, [t2, t3, t4])
+    t1 = SkillDecisionTree(MAGE_ATTACK, checker1, 5, [t2, t3, t4],
+                           stat_pure=True)
     return t1
 
 
 
 
+@compares(StatComparison(True, 'hp', '>', 50))
 def checker1(caster: 'Character', _):
 
     """
@@ -170,6 +735,7 @@ def checker1(caster: 'Character', _):
 
     return caster.get_hp() > 50
 
+@compares(StatComparison(True, 'sp', '>', 20))
 def checker2(caster: 'Character', _):
     """
     checks if caster above 20
@@ -185,6 +751,7 @@ def checker2(caster: 'Character', _):
     return caster.get_sp() > 20
 
 
+@compares(StatComparison(False, 'hp', '<', 30))
 def checker3(_, target: 'Character'):
     """
     checks if caster hp above 30
@@ -192,6 +759,7 @@ def checker3(_, target: 'Character'):
     return target.get_hp() < 30
 
 
+@compares(StatComparison(False, 'sp', '>', 40))
 def checker4(_, target: 'Character'):
     """
     checks if caster sp above 40
@@ -207,6 +775,7 @@ def checker4(_, target: 'Character'):
     return target.get_sp() > 40
 
 
+@compares(StatComparison(True, 'hp', '>', 90))
 def checker5(caster: 'Character', _):
     """
     checks if caster hp above 90
@@ -222,6 +791,7 @@ def checker5(caster: 'Character', _):
     """
     return  caster.get_hp() > 90
 
+@compares(Always(False))
 def general(_, __):
     """
     returns False
@@ -231,3 +801,9 @@ def general(_, __):
 
     """
     return False
+
+
+# The default SkillDecisionTree, built once and shared by every Sorcerer
+# that uses it, so it is frozen.
+DEFAULT_TREE = create_default_tree().freeze()
+DEFAULT_COMPILED_TREE = DEFAULT_TREE.compile()
@@ -27,6 +27,12 @@ class Skill:
         """
         return self._cost
 
+    def get_damage(self) -> int:
+        """
+        Return the damage this Skill deals before the target's defense.
+        """
+        return self._damage
+
     def use(self, caster: 'Character', target: 'Character') -> None:
         """
         Makes caster use this Skill on target.
@@ -166,12 +172,16 @@ class SorcererAttack(NormalAttack):
 
     def __init__(self, real: Any) -> None:
         """
-        Initialize this RogueSpecial.
+        Initialize this SorcererAttack, which uses the skill real. real is
+        shared, so it is left as it is.
 
-        >>> r = RogueSpecial()
+        >>> s = SorcererAttack(ROGUE_SPECIAL)
+        >>> s.get_sp_cost()
+        15
+        >>> s.get_damage()
+        20
         """
         self.real = real
-        self.real.__init__()
 
     def use(self, caster: 'Character', target: 'Character') -> None:
         """
@@ -186,6 +196,12 @@ class SorcererAttack(NormalAttack):
         """
         return 15
 
+    def get_damage(self) -> int:
+        """
+        Return the damage the skill this SorcererAttack uses deals.
+        """
+        return self.real.get_damage()
+
 
 class SorcererSpecial(Skill):
     """
@@ -290,6 +306,38 @@ class VampireSpecial(Skill):
         caster.battle_queue.add(target)
 
 
+# Skills hold no state besides their cost and damage, so every Character
+# and SkillDecisionTree shares these instead of making its own.
+MAGE_ATTACK = MageAttack()
+MAGE_SPECIAL = MageSpecial()
+ROGUE_ATTACK = RogueAttack()
+ROGUE_SPECIAL = RogueSpecial()
+SORCERER_SPECIAL = SorcererSpecial()
+VAMPIRE_ATTACK = VampireAttack()
+VAMPIRE_SPECIAL = VampireSpecial()
+
+# The shared SorcererAttack of each skill, by the id of the skill.
+_SORCERER_ATTACKS = {}
+
+
+def sorcerer_attack(real: Skill) -> SorcererAttack:
+    """
+    Return the SorcererAttack that uses real, shared by every Sorcerer whose
+    SkillDecisionTree picks real.
+
+    >>> sorcerer_attack(MAGE_ATTACK) is sorcerer_attack(MAGE_ATTACK)
+    True
+    >>> sorcerer_attack(MAGE_ATTACK).real is MAGE_ATTACK
+    True
+    """
+    attack = _SORCERER_ATTACKS.get(id(real))
+
+    if attack is None:
+        # The SorcererAttack keeps real alive, so its id isn't reused.
+        attack = _SORCERER_ATTACKS.setdefault(id(real), SorcererAttack(real))
+
+    return attack
+
 
 if __name__ == '__main__':
     import python_ta
@@ -0,0 +1,136 @@
+"""
+Benchmark SkillDecisionTree.pick_skill() against
+CompiledSkillDecisionTree.pick_skill() on the default tree and on random
+trees of growing size.
+"""
+from typing import Callable, List, Tuple
+import random
+import time
+from a2_skills import MAGE_ATTACK, MAGE_SPECIAL, ROGUE_ATTACK, ROGUE_SPECIAL
+from a2_skill_decision_tree import SkillDecisionTree, \
+    CompiledSkillDecisionTree, StatComparison, Stats, create_default_tree, \
+    DEFAULT_TREE
+
+
+def random_tree(size: int, seed: int = 0) -> SkillDecisionTree:
+    """
+    Return a SkillDecisionTree of size trees with priorities in a random
+    order, whose conditions compare the HP or SP of the caster or the
+    target with a random number. The same seed gives the same tree.
+
+    >>> t = random_tree(50)
+    >>> sorted(priorities(t)) == list(range(50))
+    True
+    """
+    rng = random.Random(seed)
+    order = list(range(size))
+    rng.shuffle(order)
+    skills = [MAGE_ATTACK, MAGE_SPECIAL, ROGUE_ATTACK, ROGUE_SPECIAL]
+    trees = [SkillDecisionTree(rng.choice(skills),
+                               StatComparison(rng.random() < 0.5,
+                                              'hp' if rng.random() < 0.5
+                                              else 'sp', '>',
+                                              rng.randint(0, 100)),
+                               priority, stat_pure=True)
+             for priority in order]
+
+    for i in range(1, size):
+        trees[rng.randrange(i)].children.append(trees[i])
+
+    return trees[0]
+
+
+def priorities(tree: SkillDecisionTree) -> List[int]:
+    """
+    Return the priorities of tree and all of its subtrees.
+
+    >>> sorted(priorities(create_default_tree()))
+    [1, 2, 3, 4, 5, 6, 7, 8]
+    """
+    result = [tree.priority]
+
+    for child in tree.children:
+        result.extend(priorities(child))
+
+    return result
+
+
+def count_checks(tree: SkillDecisionTree, players: List[Tuple['Character',
+                                                                'Character']]) \
+        -> Tuple[Tuple[int, int, float], Tuple[int, int, float]]:
+    """
+    Return how many trees SkillDecisionTree.pick_skill() visits, how many
+    conditions it checks and how many seconds it takes to pick a skill for
+    every (caster, target) pair in players, then the same for
+    CompiledSkillDecisionTree.pick_skill(). Nothing is remembered between
+    picks, and the time is taken without counting.
+
+    >>> players = [(Stats(95, 30), Stats(20, 50)),
+    ...            (Stats(40, 10), Stats(20, 50))]
+    >>> [counts[:2] for counts in count_checks(create_default_tree(),
+    ...                                        players)]
+    [(9, 9), (9, 8)]
+    """
+    counter = [0]
+    skipped = [0]
+    counted = _counting_copy(tree, counter)
+    compiled = CompiledSkillDecisionTree(counted.compile().rules)
+
+    for caster, target in players:
+        counted.pick_skill(caster, target)
+    tree_checks = counter[0]
+    counter[0] = 0
+
+    for caster, target in players:
+        compiled._evaluate(caster, target, skipped)
+    compiled_checks = counter[0]
+
+    uncounted = CompiledSkillDecisionTree(tree.compile().rules)
+    start = time.perf_counter()
+
+    for caster, target in players:
+        tree.pick_skill(caster, target)
+    tree_time = time.perf_counter() - start
+    start = time.perf_counter()
+
+    for caster, target in players:
+        uncounted.pick_skill(caster, target)
+    compiled_time = time.perf_counter() - start
+
+    # Every tree SkillDecisionTree.pick_skill() visits is checked.
+    return ((tree_checks, tree_checks, tree_time),
+            (compiled_checks + skipped[0], compiled_checks, compiled_time))
+
+
+def _counting_copy(tree: SkillDecisionTree, counter: List[int]) \
+        -> SkillDecisionTree:
+    """
+    Return a copy of tree whose conditions add 1 to counter[0] whenever they
+    are checked.
+    """
+    def condition(caster: 'Character', target: 'Character',
+                  check: Callable = tree.condition) -> bool:
+        counter[0] += 1
+        return check(caster, target)
+
+    return SkillDecisionTree(tree.value, condition, tree.priority,
+                             [_counting_copy(child, counter)
+                              for child in tree.children])
+
+
+if __name__ == '__main__':
+    PLAYERS = [(Stats(hp, sp), Stats(target_hp, target_sp))
+               for hp in range(0, 101, 10) for sp in range(0, 101, 10)
+               for target_hp in range(0, 101, 25)
+               for target_sp in range(0, 101, 25)]
+    TREES = [('default', DEFAULT_TREE)] + \
+        [('random, {} trees'.format(size), random_tree(size))
+         for size in (10, 100, 1000, 10000)]
+
+    for NAME, TREE in TREES:
+        for ENGINE, (VISITED, CHECKED, SECONDS) in \
+                zip(('tree', 'compiled'), count_checks(TREE, PLAYERS)):
+            print("{} by {}: {:.1f} trees visited and {:.1f} checked per "
+                  "pick, {:.3f}s for {} picks".format(
+                      NAME, ENGINE, VISITED / len(PLAYERS),
+                      CHECKED / len(PLAYERS), SECONDS, len(PLAYERS)))
@@ -107,6 +107,10 @@ def update_game():
         current_player = draw_parameters['current_player']
         action_label = ["Current Character: {}".format(current_player),
                         "Available Actions: {}".format(", ".join(actions))]
+
+        # Show that a computer player is still selecting its attack
+        if draw_parameters['thinking']:
+            action_label[1] = "Thinking..."
     
         y_coordinate = CHARACTER_SIZE + PADDING
         for line in action_label:
@@ -138,6 +142,7 @@ if __name__ == '__main__':
     
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                a2_game.stop_thinking()
                 pygame.quit()
                 sys.exit(0)
             if event.type == pygame.KEYDOWN and not a2_game.GAME_IS_OVER:
@@ -155,11 +160,13 @@ if __name__ == '__main__':
                     a2_game.perform_attack()
                 
         # If the current player isn't using a manual playstyle, pick a move
+        # on a worker thread, checking every tick whether it has been picked
+        # so the window keeps being redrawn in the meantime
         if (not a2_game.GAME_IS_OVER and
             not a2_game.BATTLE_QUEUE.is_over() and 
             not a2_game.BATTLE_QUEUE.peek().playstyle.is_manual and
-            RANDOM_TIMER == 10):
-            a2_game.perform_attack()
+            (RANDOM_TIMER == 10 or a2_game.THINKING)):
+            a2_game.perform_attack_async()
     
         # Redraw the game
         update_game()
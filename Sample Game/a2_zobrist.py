@@ -0,0 +1,162 @@
+"""
+64-bit Zobrist keys for hashing games.
+
+A Character's hash is the XOR of the keys of its HP and SP, so a change to
+either only needs two keys XORed in and out. A queue's hash is
+sum(key of entry i * BASE ** i) modulo 2 ** 64, so adding to the back
+multiplies one key by a power of BASE that is kept around, and removing
+from the front subtracts the front key and multiplies by the inverse of
+BASE. Every update is O(1) no matter how long the queue is.
+
+Call set_verify_hashes(True) to check every hash that is read against one
+computed from scratch.
+"""
+from typing import List
+
+MASK = (1 << 64) - 1
+# Any odd number has an inverse modulo 2 ** 64.
+BASE = 0x100000001B3
+BASE_INVERSE = pow(BASE, -1, 1 << 64)
+
+# The kinds of values that get keys.
+HP = 0
+SP = 1
+CHARACTER_TYPE = 2
+QUEUE_ENTRY = 3
+QUEUE_FLAG = 4
+
+VERIFY_HASHES = False
+
+
+class HashMismatch(Exception):
+    """
+    Raised when an incrementally updated hash doesn't match the hash
+    computed from scratch.
+    """
+
+
+def set_verify_hashes(verify: bool) -> None:
+    """
+    Turn the check of every hash that is read against one computed from
+    scratch on or off.
+    """
+    global VERIFY_HASHES
+    VERIFY_HASHES = verify
+
+
+def zobrist_key(kind: int, value: int) -> int:
+    """
+    Return the 64-bit key of value, a value of kind kind. The same key is
+    returned in every process.
+
+    >>> zobrist_key(HP, 100) == zobrist_key(HP, 100)
+    True
+    >>> zobrist_key(HP, 100) == zobrist_key(SP, 100)
+    False
+    >>> 0 <= zobrist_key(SP, -5) <= MASK
+    True
+    """
+    # splitmix64
+    z = ((kind << 32) ^ (value & 0xFFFFFFFF)) + 0x9E3779B97F4A7C15 & MASK
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK
+    return z ^ (z >> 31)
+
+
+class KeyTable(dict):
+    """
+    The keys of the values of one kind, each worked out the first time it
+    is looked up.
+
+    kind - the kind of the values in this KeyTable.
+    """
+    kind: int
+
+    def __init__(self, kind: int) -> None:
+        """
+        Initialize this KeyTable for values of kind kind.
+
+        >>> KeyTable(HP)[100] == zobrist_key(HP, 100)
+        True
+        """
+        super().__init__()
+        self.kind = kind
+
+    def __missing__(self, value: int) -> int:
+        """
+        Work out, store and return the key of value.
+        """
+        key = zobrist_key(self.kind, value)
+        self[value] = key
+
+        return key
+
+
+HP_KEYS = KeyTable(HP)
+SP_KEYS = KeyTable(SP)
+# The keys of queue entries for the first and the second player.
+ENTRY_KEYS = (zobrist_key(QUEUE_ENTRY, 0), zobrist_key(QUEUE_ENTRY, 1))
+# The keys of RestrictedBattleQueue entries for the first player able and
+# unable to add, then the second player able and unable to add.
+FLAG_KEYS = tuple(zobrist_key(QUEUE_FLAG, value) for value in range(4))
+
+_TYPE_KEYS = {}
+
+
+def type_key(character_type: str) -> int:
+    """
+    Return the key of the character type character_type.
+
+    >>> type_key('mage') == type_key('rogue')
+    False
+    """
+    key = _TYPE_KEYS.get(character_type)
+
+    if key is None:
+        key = zobrist_key(CHARACTER_TYPE, int.from_bytes(
+            character_type.encode()[:4], 'little'))
+        _TYPE_KEYS[character_type] = key
+
+    return key
+
+
+def stats_hash(hp: int, sp: int) -> int:
+    """
+    Return the hash of a Character with hp HP and sp SP.
+    """
+    return HP_KEYS[hp] ^ SP_KEYS[sp]
+
+
+def sequence_hash(keys: List[int]) -> int:
+    """
+    Return the hash of a queue whose entries have keys keys, front first,
+    computed from scratch.
+
+    >>> sequence_hash([5, 7]) == (5 + 7 * BASE) & MASK
+    True
+    """
+    result = 0
+
+    for key in reversed(keys):
+        result = (result * BASE + key) & MASK
+
+    return result
+
+
+def rotate(value: int) -> int:
+    """
+    Return value rotated left by one bit, so that two players with the same
+    hash don't cancel each other out.
+    """
+    return (value << 1 | value >> 63) & MASK
+
+
+def check_hash(incremental: int, from_scratch: int) -> int:
+    """
+    Return incremental, raising a HashMismatch if it isn't from_scratch.
+    """
+    if incremental != from_scratch:
+        raise HashMismatch("incremental hash {:x} != {:x}".format(
+            incremental, from_scratch))
+
+    return incremental